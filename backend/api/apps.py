@@ -6,3 +6,9 @@ from django.apps import AppConfig
 
 class DomainConfig(AppConfig):
     name = "api"
+
+    def ready(self):
+        """Connect API signals."""
+        import api.v1.authentication  # noqa: F401
+        import api.v1.cache  # noqa: F401
+        import api.v1.databases  # noqa: F401
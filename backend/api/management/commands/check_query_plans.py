@@ -0,0 +1,204 @@
+"""A management command for checking query plans of hot API queries."""
+
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+from api.v1.paginators import KeysetPagination
+from api.v1.views import CustomUserViewSet, IngredientViewSet, RecipeViewSet
+from recipe.models import Recipe
+from users.models import User
+
+FULL_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b.*\bINDEX\b)"),
+}
+
+
+def get_view(view_class, action, user, query_params=None, **kwargs):
+    """Return a viewset prepared for a GET request of an action."""
+    http_request = HttpRequest()
+    http_request.method = "GET"
+    http_request.GET = QueryDict(mutable=True)
+    http_request.GET.update(query_params or {})
+    request = Request(http_request)
+    request.user = user
+    return view_class(
+        action=action,
+        request=request,
+        args=(),
+        kwargs=kwargs,
+        format_kwarg=None,
+    )
+
+
+def get_list_queryset(view_class, user, query_params=None):
+    """Return a filtered queryset of a viewset list action."""
+    view = get_view(view_class, "list", user, query_params)
+    return view.filter_queryset(view.get_queryset())
+
+
+def get_prefetch_queryset(queryset, lookup):
+    """Return a queryset of a Prefetch lookup of a queryset."""
+    for prefetch in queryset._prefetch_related_lookups:
+        if isinstance(prefetch, Prefetch) and prefetch.prefetch_to == lookup:
+            return prefetch.queryset
+    raise CommandError(f"There is no {lookup} prefetch.")
+
+
+def get_hot_queries():
+    """Return names, querysets and vendors of hot API queries.
+
+    Querysets are built by the API viewsets, a None queryset is skipped.
+    """
+    user = User(pk=1)
+    recipes_ids = [1, 2, 3]
+    users_ids = [1, 2, 3]
+    recipes = get_list_queryset(RecipeViewSet, user)
+    tag_slug = (
+        Recipe.tags.through.objects.values_list("tag__slug", flat=True)
+        .order_by()
+        .first()
+    )
+    recipes_by_tags = None
+    if tag_slug is not None:
+        recipes_by_tags = get_list_queryset(
+            RecipeViewSet, user, {"tags": tag_slug}
+        )[:10]
+    feed_view = get_view(RecipeViewSet, "feed", user)
+    (timeline, timeline_id), (pulled, pulled_id) = (
+        feed_view.get_feed_sources()
+    )
+    users_view = get_view(CustomUserViewSet, "subscriptions", user)
+    cart_view = get_view(RecipeViewSet, "download_shopping_cart", user)
+    return (
+        ("recipe feed", recipes[:10], None),
+        (
+            "recipe feed by cursor",
+            recipes.order_by(*KeysetPagination.ordering)[:10],
+            None,
+        ),
+        ("recipe feed by tags", recipes_by_tags, None),
+        (
+            "recipe feed by author",
+            get_list_queryset(RecipeViewSet, user, {"author": user.pk})[:10],
+            None,
+        ),
+        (
+            "favorited recipes",
+            get_list_queryset(RecipeViewSet, user, {"is_favorited": "1"})[
+                :10
+            ],
+            None,
+        ),
+        (
+            "recipes in shopping cart",
+            get_list_queryset(
+                RecipeViewSet, user, {"is_in_shopping_cart": "1"}
+            )[:10],
+            None,
+        ),
+        (
+            "recipe portions",
+            get_prefetch_queryset(recipes, "ingredients_in_portion").filter(
+                recipe__in=recipes_ids
+            ),
+            None,
+        ),
+        (
+            "follow feed timeline",
+            timeline.order_by("-pub_date", f"-{timeline_id}").values_list(
+                "pub_date", timeline_id
+            )[:10],
+            None,
+        ),
+        (
+            "follow feed pulled recipes",
+            pulled.order_by("-pub_date", f"-{pulled_id}").values_list(
+                "pub_date", pulled_id
+            )[:10],
+            None,
+        ),
+        (
+            "subscriptions",
+            users_view.get_subscriptions_queryset()[:10],
+            None,
+        ),
+        (
+            "is subscribed of users",
+            get_list_queryset(CustomUserViewSet, user).filter(
+                pk__in=users_ids
+            ),
+            None,
+        ),
+        (
+            "shopping cart download",
+            cart_view.get_shopping_cart_queryset(),
+            None,
+        ),
+        (
+            "ingredient autocomplete",
+            get_list_queryset(IngredientViewSet, user, {"name": "сыр"}),
+            "postgresql",
+        ),
+        (
+            "recipe search",
+            get_list_queryset(RecipeViewSet, user, {"search": "борщ"})[:10],
+            "postgresql",
+        ),
+    )
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = "Fail if a hot API query plan falls back to a full table scan"
+
+    def get_full_scans(self, queryset):
+        """Return a plan and names of fully scanned tables of a queryset."""
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+        pattern = FULL_SCAN_PATTERNS[connection.vendor]
+        return plan, [
+            match.group(1)
+            for line in plan.splitlines()
+            for match in [pattern.search(line)]
+            if match
+        ]
+
+    def handle(self, *args, **options):
+        """A method for checking query plans."""
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            raise CommandError(
+                f"Query plans of {connection.vendor} are not supported."
+            )
+        failures = []
+        for name, queryset, vendor in get_hot_queries():
+            if queryset is None or (
+                vendor is not None and vendor != connection.vendor
+            ):
+                self.stdout.write(f"SKIP {name}")
+                continue
+            plan, full_scans = self.get_full_scans(queryset)
+            if full_scans:
+                failures.append(name)
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"FAIL {name}: full scan of {', '.join(full_scans)}"
+                    )
+                )
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(f"OK {name}")
+        if failures:
+            raise CommandError(
+                f"{len(failures)} hot queries use full table scans."
+            )
+        self.stdout.write(self.style.SUCCESS("Every hot query uses indexes."))
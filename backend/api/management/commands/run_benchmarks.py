@@ -0,0 +1,172 @@
+"""A management command for benchmarking hot API endpoints."""
+
+
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.v1.profiling import PERCENTILES, QueryTimer, get_percentile
+from recipe.models import Ingredient, Recipe, Tag
+from users.models import User
+
+DEFAULT_BASELINE_PATH = os.path.join(
+    settings.BASE_DIR, "benchmarks", "baseline.json"
+)
+
+
+def get_scenarios(recipe, tag, ingredient):
+    """Return names and URLs of benchmark scenarios."""
+    return (
+        ("recipe list", "/api/recipes/?limit=10"),
+        ("recipe detail", f"/api/recipes/{recipe.id}/"),
+        ("recipe list by tags", f"/api/recipes/?limit=10&tags={tag.slug}"),
+        ("favorited recipes", "/api/recipes/?limit=10&is_favorited=1"),
+        ("subscriptions", "/api/users/subscriptions/?limit=6&recipes_limit=3"),
+        (
+            "ingredient autocomplete",
+            f"/api/ingredients/?name={ingredient.name[:3]}",
+        ),
+        ("shopping cart download", "/api/recipes/download_shopping_cart/"),
+    )
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = (
+        "Benchmark hot API endpoints through the test client "
+        "and compare results with a baseline"
+    )
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "--username",
+            default="synthetic0",
+            help="A user which requests are made by",
+        )
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--baseline",
+            default=DEFAULT_BASELINE_PATH,
+            help="Path to a baseline JSON file",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store results as a new baseline",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed p95 latency growth over the baseline",
+        )
+
+    def get_client(self, username):
+        """Return a test client authenticated with a user token."""
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(
+                f"There is no {username} user, run generate_data first."
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        return Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def measure(self, client, url):
+        """Return a latency in ms and a queries count of one request."""
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        latency = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}.")
+        return latency, timer.count
+
+    def run_scenario(self, client, url, iterations, warmup):
+        """Return latency percentiles and a queries count of a scenario."""
+        for _ in range(warmup):
+            self.measure(client, url)
+        latencies = []
+        queries = 0
+        for _ in range(iterations):
+            latency, queries = self.measure(client, url)
+            latencies.append(latency)
+        latencies.sort()
+        result = {
+            f"p{percentile}": get_percentile(latencies, percentile)
+            for percentile in PERCENTILES
+        }
+        result["queries"] = queries
+        return result
+
+    def compare(self, name, result, baseline, tolerance):
+        """Return a comparison line and regression flag of a scenario."""
+        if name not in baseline:
+            return "new", False
+        previous = baseline[name]
+        p95_change = result["p95"] / previous["p95"] - 1
+        regressed = (
+            p95_change > tolerance or result["queries"] > previous["queries"]
+        )
+        line = (
+            f"p95 {p95_change:+.0%}, "
+            f"queries {result['queries'] - previous['queries']:+d}"
+        )
+        return line, regressed
+
+    def handle(self, *args, **options):
+        """A method for benchmarking hot API endpoints."""
+        client = self.get_client(options["username"])
+        recipe = Recipe.objects.order_by("id").first()
+        tag = Tag.objects.order_by("id").first()
+        ingredient = Ingredient.objects.order_by("id").first()
+        if recipe is None or tag is None or ingredient is None:
+            raise CommandError("A dataset is empty, run generate_data first.")
+        baseline = {}
+        if os.path.exists(options["baseline"]):
+            with open(options["baseline"], encoding="utf-8") as f:
+                baseline = json.load(f)
+        results = {}
+        regressions = []
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"], REQUEST_PROFILING=False
+        ):
+            for name, url in get_scenarios(recipe, tag, ingredient):
+                result = self.run_scenario(
+                    client, url, options["iterations"], options["warmup"]
+                )
+                results[name] = result
+                comparison, regressed = self.compare(
+                    name, result, baseline, options["tolerance"]
+                )
+                if regressed:
+                    regressions.append(name)
+                self.stdout.write(
+                    f"{name:<25} "
+                    + " ".join(
+                        f"p{percentile} {result[f'p{percentile}']:7.1f} ms"
+                        for percentile in PERCENTILES
+                    )
+                    + f"  {result['queries']:3d} queries  {comparison}"
+                )
+        if options["save_baseline"]:
+            os.makedirs(os.path.dirname(options["baseline"]), exist_ok=True)
+            with open(options["baseline"], "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=4, sort_keys=True)
+            self.stdout.write(f"Baseline is saved to {options['baseline']}.")
+        elif regressions:
+            raise CommandError(
+                f"Regressions against the baseline: {', '.join(regressions)}."
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmarks are finished."))
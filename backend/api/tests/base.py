@@ -0,0 +1,181 @@
+"""Shared API tests setup."""
+
+
+import logging
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from recipe.models import Ingredient, IngredientPortion, Recipe, Tag
+from users.models import User
+
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+class CaptureAllQueriesContext:
+    """Capture queries of every database alias, read replicas included."""
+    def __init__(self):
+        self.contexts = [
+            CaptureQueriesContext(connections[alias]) for alias in connections
+        ]
+        self.stack = ExitStack()
+
+    def __enter__(self):
+        for context in self.contexts:
+            self.stack.enter_context(context)
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.stack.__exit__(*exc_info)
+
+    def __iter__(self):
+        return iter(self.captured_queries)
+
+    def __len__(self):
+        return len(self.captured_queries)
+
+    @property
+    def captured_queries(self):
+        """Return queries of every alias."""
+        return [
+            query
+            for context in self.contexts
+            for query in context.captured_queries
+        ]
+
+
+class ApiTestMixin:
+    """Helpers creating users, recipes and clients.
+
+    Tests may use every database alias. Test mirrors of the primary, read
+    replicas, share its connection, so they read data of a test
+    transaction, queries are counted on every alias.
+    """
+    databases = "__all__"
+
+    @classmethod
+    def _databases_names(cls, include_mirrors=True):
+        """Open test transactions on the primary only, not on mirrors."""
+        return super()._databases_names(include_mirrors=False)
+
+    @classmethod
+    def setUpClass(cls):
+        """Keep request profiling quiet."""
+        super().setUpClass()
+        logging.getLogger("api.profiling").setLevel(logging.WARNING)
+
+    def setUp(self):
+        """Clear caches shared between tests, keep uploads in a temp dir."""
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.share_primary_connection()
+
+    def share_primary_connection(self):
+        """Make test mirrors of the primary use its DB connection."""
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        for alias in connections:
+            mirror = connections[alias]
+            if mirror.settings_dict["TEST"]["MIRROR"] != DEFAULT_DB_ALIAS:
+                continue
+            mirror.close()
+            mirror.connection = primary.connection
+            self.addCleanup(setattr, mirror, "connection", None)
+
+    @contextmanager
+    def assertNumQueries(self, num, using=None):  # noqa: N802
+        """Assert queries made on one database alias or on every one."""
+        if using is not None:
+            with super().assertNumQueries(num, using=using):
+                yield
+            return
+        with CaptureAllQueriesContext() as context:
+            yield
+        self.assertEqual(
+            len(context),
+            num,
+            "%d queries executed, %d expected\nCaptured queries were:\n%s"
+            % (
+                len(context),
+                num,
+                "\n".join(
+                    f"{number}. {query['sql']}"
+                    for number, query in enumerate(context, start=1)
+                ),
+            ),
+        )
+
+    @classmethod
+    def create_user(cls, username):
+        """Create a user with a username based E-Mail."""
+        return User.objects.create_user(
+            username=username,
+            email=f"{username}@example.com",
+            password="test-password",
+            first_name="Test",
+            last_name=username,
+        )
+
+    @classmethod
+    def create_recipe(cls, author, name="Recipe", ingredients=(), tags=()):
+        """Create a recipe with given ingredients amounts and tags."""
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            text="Recipe text.",
+            cooking_time=10,
+            image="recipe.png",
+        )
+        recipe.tags.set(tags)
+        IngredientPortion.objects.bulk_create(
+            IngredientPortion(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in ingredients
+        )
+        return recipe
+
+    @classmethod
+    def create_ingredient(cls, name, measurement_unit="г"):
+        """Create an ingredient."""
+        return Ingredient.objects.create(
+            name=name, measurement_unit=measurement_unit
+        )
+
+    @classmethod
+    def create_tag(cls, slug):
+        """Create a tag."""
+        return Tag.objects.create(
+            name=slug, color=f"#{Tag.objects.count():06x}", slug=slug
+        )
+
+    def get_client(self, user=None):
+        """Return a client authenticated as a user or an anonymous one."""
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+
+class ApiTestCase(ApiTestMixin, APITestCase):
+    """Test case with API helpers."""
+
+
+class ApiTransactionTestCase(ApiTestMixin, APITransactionTestCase):
+    """Transaction test case with API helpers.
+
+    Used when on-commit callbacks or transactions of a request matter.
+    """
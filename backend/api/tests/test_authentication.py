@@ -0,0 +1,76 @@
+"""Cached token authentication tests."""
+
+
+from unittest import mock
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from api.v1.authentication import TokenUserCache, token_user_cache
+from users.models import User
+
+
+class TokenUserCacheTests(APITransactionTestCase):
+    """Revoked tokens are not served from any tier of the cache.
+
+    Invalidations run after a commit, so a transaction test case is used.
+    """
+    def setUp(self):
+        """Create a user with a token and reset the cache."""
+        cache.clear()
+        token_user_cache.entries.clear()
+        self.user = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="test-password",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def get_me_status(self):
+        """Return a status code of a current user request."""
+        return self.client.get("/api/users/me/").status_code
+
+    def assert_bulk_deactivation_revokes(self):
+        """Assert a queryset update revokes a cached token."""
+        self.assertEqual(self.get_me_status(), status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_me_status(), status.HTTP_200_OK)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get_me_status(), status.HTTP_401_UNAUTHORIZED)
+
+    def test_local_bulk_deactivation(self):
+        with mock.patch.object(token_user_cache, "shared_timeout", 0):
+            self.assert_bulk_deactivation_revokes()
+
+    def test_shared_bulk_deactivation(self):
+        with mock.patch.object(token_user_cache, "shared_timeout", 60):
+            self.assert_bulk_deactivation_revokes()
+
+    def test_counter_update_keeps_cached_token(self):
+        self.get_me_status()
+        User.objects.filter(pk=self.user.pk).update(recipes_count=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_me_status(), status.HTTP_200_OK)
+
+    def test_shared_invalidation_is_seen_by_other_processes(self):
+        caches = [TokenUserCache(10, 30, 60), TokenUserCache(10, 30, 60)]
+        for process_cache in caches:
+            _, version = process_cache.get(self.token.key)
+            process_cache.set(self.token.key, self.user, version)
+            self.assertEqual(process_cache.get(self.token.key)[0], self.user)
+        caches[0].invalidate([self.token.key])
+        for process_cache in caches:
+            self.assertIsNone(process_cache.get(self.token.key)[0])
+
+    def test_read_before_invalidation_is_not_cached(self):
+        for shared_timeout in (0, 60):
+            process_cache = TokenUserCache(10, 30, shared_timeout)
+            with self.subTest(shared_timeout=shared_timeout):
+                _, version = process_cache.get(self.token.key)
+                process_cache.invalidate([self.token.key])
+                process_cache.set(self.token.key, self.user, version)
+                self.assertIsNone(process_cache.get(self.token.key)[0])
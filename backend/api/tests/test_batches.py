@@ -0,0 +1,76 @@
+"""Favorite and shopping cart batch API tests."""
+
+
+from rest_framework import status
+
+from api.tests.base import ApiTestCase
+from recipe.models import IsFavorited, IsInShoppingCart
+
+
+class BatchQueriesTests(ApiTestCase):
+    """Batch endpoints make the same queries for any number of recipes.
+
+    Adding recipes one by one makes queries for every recipe, a batch
+    replaces those requests.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        """Create recipes with ingredients."""
+        cls.reader = cls.create_user("reader")
+        author = cls.create_user("author")
+        ingredients = [
+            cls.create_ingredient(f"ingredient{number}")
+            for number in range(3)
+        ]
+        cls.recipes_ids = [
+            cls.create_recipe(
+                author,
+                name=f"Recipe {number}",
+                ingredients=(
+                    (ingredients[number % 3], 100),
+                    (ingredients[(number + 1) % 3], 50),
+                ),
+            ).id
+            for number in range(6)
+        ]
+
+    def assert_batch_queries(
+        self, name, model, single_num, add_num, remove_num
+    ):
+        """Assert queries of single and batch requests of an endpoint."""
+        client = self.get_client(self.reader)
+        for recipes_count in (2, 6):
+            recipes_ids = self.recipes_ids[:recipes_count]
+            with self.subTest(name=name, recipes_count=recipes_count):
+                with self.assertNumQueries(single_num * recipes_count):
+                    for recipes_id in recipes_ids:
+                        response = client.get(
+                            f"/api/recipes/{recipes_id}/{name}/"
+                        )
+                        self.assertEqual(
+                            response.status_code, status.HTTP_201_CREATED
+                        )
+                model.objects.all().delete()
+                with self.assertNumQueries(add_num):
+                    response = client.post(
+                        f"/api/recipes/{name}/batch/",
+                        {"recipes": recipes_ids},
+                        format="json",
+                    )
+                self.assertEqual(
+                    [item["status"] for item in response.data["results"]],
+                    ["added"] * recipes_count,
+                )
+                with self.assertNumQueries(remove_num):
+                    client.delete(
+                        f"/api/recipes/{name}/batch/",
+                        {"recipes": recipes_ids},
+                        format="json",
+                    )
+                self.assertFalse(model.objects.exists())
+
+    def test_favorite_batch_queries(self):
+        self.assert_batch_queries("favorite", IsFavorited, 5, 5, 5)
+
+    def test_shopping_cart_batch_queries(self):
+        self.assert_batch_queries("shopping_cart", IsInShoppingCart, 8, 8, 8)
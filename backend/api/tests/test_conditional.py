@@ -0,0 +1,153 @@
+"""Conditional GET API tests."""
+
+
+from unittest import mock
+
+from django.test import override_settings
+from django.utils.http import http_date
+from rest_framework import status
+
+from api.tests.base import ApiTestCase, CaptureAllQueriesContext
+from api.v1.cache import check_shared_cache
+from recipe.models import Recipe
+from users.models import User
+
+
+class RecipeListConditionalGetTests(ApiTestCase):
+    """A recipes list page is loaded once with or without an ETag."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create recipes with ingredients and tags."""
+        author = cls.create_user("author")
+        ingredient = cls.create_ingredient("flour")
+        tag = cls.create_tag("lunch")
+        for number in range(3):
+            cls.create_recipe(
+                author,
+                name=f"Recipe {number}",
+                ingredients=((ingredient, 100),),
+                tags=(tag,),
+            )
+
+    def get_page_queries(self, client, **headers):
+        """Return a response and recipe page SELECT queries of it."""
+        with CaptureAllQueriesContext() as queries:
+            response = client.get("/api/recipes/?limit=2", **headers)
+        return response, [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT")
+            and 'FROM "recipe_recipe"' in query["sql"]
+            and "LIMIT" in query["sql"]
+        ]
+
+    def test_list_loads_page_once(self):
+        client = self.get_client()
+        response, page_queries = self.get_page_queries(client)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(len(page_queries), 1)
+
+        response, page_queries = self.get_page_queries(
+            client, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(page_queries), 1)
+
+    def test_not_modified_list_skips_prefetches(self):
+        client = self.get_client()
+        response = client.get("/api/recipes/?limit=2")
+        with CaptureAllQueriesContext() as sent:
+            client.get("/api/recipes/?limit=2")
+        with CaptureAllQueriesContext() as not_modified:
+            client.get(
+                "/api/recipes/?limit=2", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertLess(len(not_modified), len(sent))
+
+
+class RecipeETagTests(ApiTestCase):
+    """A recipe ETag changes with every part of a payload."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create recipes of one author."""
+        cls.author = cls.create_user("author")
+        cls.recipes = [
+            cls.create_recipe(cls.author, name=f"Recipe {number}")
+            for number in range(5)
+        ]
+
+    def get(self, url, response=None):
+        """Return a response to a request conditional on a response."""
+        headers = {}
+        if response is not None:
+            headers["HTTP_IF_NONE_MATCH"] = response["ETag"]
+        return self.get_client().get(url, **headers)
+
+    def test_author_change_is_sent(self):
+        url = f"/api/recipes/{self.recipes[0].id}/"
+        response = self.get(url)
+        self.assertEqual(
+            self.get(url, response).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = "Renamed"
+        author.save()
+        response = self.get(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["author"]["first_name"], "Renamed")
+
+    def test_count_and_links_change_is_sent(self):
+        url = "/api/recipes/?limit=2"
+        response = self.get(url)
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual(
+            self.get(url, response).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        Recipe.objects.get(pk=self.recipes[0].pk).delete()
+        response = self.get(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 4)
+
+        Recipe.objects.filter(
+            pk__in=[self.recipes[1].pk, self.recipes[2].pk]
+        ).delete()
+        response = self.get(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["next"])
+
+
+class CatalogConditionalGetTests(ApiTestCase):
+    """A catalog change is never hidden by If-Modified-Since."""
+    def get_tags(self, **headers):
+        return self.get_client().get("/api/tags/", **headers)
+
+    def test_change_in_same_second_is_sent(self):
+        with mock.patch("api.v1.cache.time.time", return_value=1000.2):
+            self.create_tag("lunch")
+            response = self.get_tags()
+        self.assertEqual(response["Last-Modified"], http_date(1000))
+
+        with mock.patch("api.v1.cache.time.time", return_value=1000.7):
+            self.create_tag("dinner")
+        response = self.get_tags(
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        response = self.get_tags(HTTP_IF_MODIFIED_SINCE=http_date(1001))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            }
+        }
+    )
+    def test_per_process_cache_is_warned_about(self):
+        warnings = check_shared_cache(None)
+        self.assertEqual([warning.id for warning in warnings], ["api.W001"])
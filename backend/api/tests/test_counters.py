@@ -0,0 +1,68 @@
+"""Denormalized counters tests."""
+
+
+from api.tests.base import ApiTestCase, CaptureAllQueriesContext
+from recipe.models import IsFavorited, IsInShoppingCart, Recipe
+from users.models import Follow, User
+
+
+class CountersTests(ApiTestCase):
+    """Tests of counters kept by deletes."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user("author")
+        cls.ingredient = cls.create_ingredient("flour")
+        cls.customers = [
+            cls.create_user(f"customer{i}") for i in range(20)
+        ]
+
+    def add_customers(self, recipe, customers):
+        for model in (IsFavorited, IsInShoppingCart):
+            for customer in customers:
+                model.objects.add_pairs(customer.id, [recipe.id])
+
+    def get_destroy_queries_count(self, customers_count):
+        recipe = self.create_recipe(
+            self.author, "Bread", [(self.ingredient, 100)]
+        )
+        self.add_customers(recipe, self.customers[:customers_count])
+        client = self.get_client(self.author)
+        with CaptureAllQueriesContext() as context:
+            response = client.delete(f"/api/recipes/{recipe.id}/")
+        self.assertEqual(response.status_code, 204)
+        return len(context.captured_queries)
+
+    def test_recipe_destroy_query_count_is_constant(self):
+        self.assertEqual(
+            self.get_destroy_queries_count(1),
+            self.get_destroy_queries_count(20),
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_user_delete_decreases_counters_of_others(self):
+        recipe = self.create_recipe(self.author, "Bread")
+        leaving, staying = self.customers[:2]
+        self.add_customers(recipe, [leaving, staying])
+        Follow.objects.add_pairs(leaving.id, [self.author.id])
+        User.objects.get(pk=leaving.pk).delete()
+        recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (1, 1)
+        )
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertEqual(self.author.recipes_count, 1)
+
+    def test_pair_and_recipe_delete_decrease_counters(self):
+        recipe = self.create_recipe(self.author, "Bread")
+        self.add_customers(recipe, self.customers[:3])
+        IsFavorited.objects.filter(user=self.customers[0]).get().delete()
+        IsInShoppingCart.objects.filter(user__in=self.customers[:2]).delete()
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (2, 1)
+        )
+        Recipe.objects.filter(pk=recipe.pk).delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
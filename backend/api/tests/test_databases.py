@@ -0,0 +1,185 @@
+"""Read replica routing and connection health checks tests."""
+
+
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from api.tests.base import ApiTestCase
+from api.v1 import databases
+from api.v1.databases import ReplicaRouter, get_replica_aliases
+from recipe.models import Recipe
+
+REPLICA_ALIAS = "replica_0"
+
+route_read = ReplicaRouter.db_for_read
+
+
+class ReplicaRouterTests(ApiTestCase):
+    """Safe API reads go to a replica unless a user has just written.
+
+    A replica alias is patched in, reads the router picks are recorded and
+    run on the primary, so routing is checked with no replica configured.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        """Create an author with a recipe and a reader."""
+        cls.author = cls.create_user("author")
+        cls.reader = cls.create_user("reader")
+        cls.recipe = cls.create_recipe(cls.author)
+
+    def setUp(self):
+        """Patch a replica alias in and record reads picked by the router."""
+        super().setUp()
+        aliases = mock.patch.object(
+            databases, "get_replica_aliases", return_value=[REPLICA_ALIAS]
+        )
+        aliases.start()
+        self.addCleanup(aliases.stop)
+        self.reads = []
+
+        def record_read(router, model, **hints):
+            self.reads.append(route_read(router, model, **hints))
+
+        router = mock.patch.object(
+            ReplicaRouter,
+            "db_for_read",
+            autospec=True,
+            side_effect=record_read,
+        )
+        router.start()
+        self.addCleanup(router.stop)
+
+    def get_reads(self, client, method, url, data=None):
+        """Return aliases picked for reads of a request."""
+        self.reads.clear()
+        response = getattr(client, method)(url, data, format="json")
+        self.assertLess(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(getattr(databases.replica_state, "alias", None))
+        return self.reads
+
+    def test_safe_requests_read_from_replica(self):
+        for user in (None, self.reader):
+            with self.subTest(user=user):
+                reads = self.get_reads(
+                    self.get_client(user), "get", "/api/recipes/"
+                )
+                self.assertIn(REPLICA_ALIAS, reads)
+        self.reads.clear()
+        Recipe.objects.count()
+        self.assertEqual(self.reads, [None])
+
+    def test_writes_pin_user_to_primary(self):
+        client = self.get_client(self.reader)
+        reads = self.get_reads(
+            client,
+            "post",
+            "/api/recipes/favorite/batch/",
+            {"recipes": [self.recipe.id]},
+        )
+        self.assertNotIn(REPLICA_ALIAS, reads)
+        reads = self.get_reads(client, "get", "/api/recipes/")
+        self.assertNotIn(REPLICA_ALIAS, reads)
+        reads = self.get_reads(self.get_client(), "get", "/api/recipes/")
+        self.assertIn(REPLICA_ALIAS, reads)
+
+        with override_settings(DB_REPLICA_STICKY_TIMEOUT=0):
+            self.get_reads(
+                self.get_client(self.author),
+                "post",
+                "/api/recipes/favorite/batch/",
+                {"recipes": [self.recipe.id]},
+            )
+        reads = self.get_reads(
+            self.get_client(self.author), "get", "/api/recipes/"
+        )
+        self.assertIn(REPLICA_ALIAS, reads)
+
+    def test_primary_actions_read_from_primary(self):
+        client = self.get_client(self.reader)
+        for url in (
+            f"/api/recipes/{self.recipe.id}/favorite/",
+            f"/api/recipes/{self.recipe.id}/shopping_cart/",
+            f"/api/users/{self.author.id}/subscribe/",
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertNotIn(
+                    REPLICA_ALIAS, self.get_reads(client, "get", url)
+                )
+                self.assertTrue(databases.is_pinned_to_primary(self.reader))
+
+    def test_writes_and_migrations_use_primary(self):
+        router = ReplicaRouter()
+        databases.use_replica(self.reader)
+        try:
+            self.assertEqual(route_read(router, Recipe), REPLICA_ALIAS)
+            self.assertEqual(router.db_for_write(Recipe), DEFAULT_DB_ALIAS)
+        finally:
+            databases.use_primary()
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, "recipe"))
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, "recipe"))
+
+    @skipUnless(get_replica_aliases(), "No read replica is configured.")
+    def test_configured_replica_is_queried(self):
+        alias = get_replica_aliases()[0]
+        with mock.patch.object(
+            databases, "get_replica_aliases", return_value=[alias]
+        ), mock.patch.object(
+            ReplicaRouter, "db_for_read", route_read
+        ), CaptureQueriesContext(connections[alias]) as queries:
+            response = self.get_client().get("/api/recipes/?limit=10")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertGreater(len(queries), 0)
+
+
+class ConnectionHealthCheckTests(ApiTestCase):
+    """Broken persistent connections are closed once per interval."""
+    def get_connection(self, usable=True, in_atomic_block=False):
+        """Return a fake open connection."""
+        return mock.Mock(
+            connection=object(),
+            in_atomic_block=in_atomic_block,
+            is_usable=mock.Mock(return_value=usable),
+            spec=["connection", "in_atomic_block", "is_usable", "close"],
+        )
+
+    def check(self, *fake_connections):
+        """Run a health check over fake connections."""
+        with mock.patch.object(databases, "connections") as all_connections:
+            all_connections.all.return_value = fake_connections
+            databases.check_connections_health()
+
+    @override_settings(DB_HEALTH_CHECK_INTERVAL=30)
+    def test_broken_connections_are_closed(self):
+        broken = self.get_connection(usable=False)
+        usable = self.get_connection()
+        in_transaction = self.get_connection(
+            usable=False, in_atomic_block=True
+        )
+        self.check(broken, usable, in_transaction)
+        broken.close.assert_called_once_with()
+        usable.close.assert_not_called()
+        in_transaction.is_usable.assert_not_called()
+        in_transaction.close.assert_not_called()
+
+        self.check(broken, usable)
+        broken.is_usable.assert_called_once_with()
+        usable.is_usable.assert_called_once_with()
+
+        with mock.patch.object(databases.time, "monotonic") as monotonic:
+            monotonic.return_value = broken.health_checked_at + 31
+            self.check(broken)
+        self.assertEqual(broken.close.call_count, 2)
+
+    @override_settings(DB_HEALTH_CHECK_INTERVAL=0)
+    def test_health_check_can_be_turned_off(self):
+        broken = self.get_connection(usable=False)
+        self.check(broken)
+        broken.is_usable.assert_not_called()
+        broken.close.assert_not_called()
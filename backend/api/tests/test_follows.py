@@ -0,0 +1,89 @@
+"""Follows API tests."""
+
+
+from django.test import override_settings
+from rest_framework import status
+
+from api.tests.base import ApiTestCase
+from recipe.models import TimelineEntry
+from users.models import Follow
+
+
+class FollowQueriesTests(ApiTestCase):
+    """Follow endpoints make the same queries for any amount of data."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create a reader and authors with different recipes numbers."""
+        cls.reader = cls.create_user("reader")
+        cls.authors = []
+        for number in range(5):
+            author = cls.create_user(f"author{number}")
+            for recipe_number in range(number + 1):
+                cls.create_recipe(author, name=f"Recipe {recipe_number}")
+            cls.authors.append(author)
+
+    def test_subscriptions_queries(self):
+        client = self.get_client(self.reader)
+        for followed_count in (1, 5):
+            Follow.objects.all().delete()
+            for author in self.authors[:followed_count]:
+                Follow.objects.create(follower=self.reader, author=author)
+            for recipes_limit in ("", "&recipes_limit=1", "&recipes_limit=3"):
+                url = f"/api/users/subscriptions/?limit=10{recipes_limit}"
+                with self.subTest(url=url, followed_count=followed_count):
+                    with self.assertNumQueries(3):
+                        response = client.get(url)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertEqual(
+                        len(response.data["results"]), followed_count
+                    )
+
+    def test_follow_queries(self):
+        client = self.get_client(self.reader)
+        for recipes_count in (1, 5):
+            author = self.authors[recipes_count - 1]
+            url = f"/api/users/{author.id}/subscribe/"
+            with self.subTest(recipes_count=recipes_count):
+                with self.assertNumQueries(9):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(
+                    len(response.data["recipes"]), recipes_count
+                )
+                with self.assertNumQueries(7):
+                    response = client.delete(url)
+                self.assertEqual(
+                    response.status_code, status.HTTP_204_NO_CONTENT
+                )
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+class FollowFeedTests(ApiTestCase):
+    """Follow feed keeps recipes of authors crossing the fan-out limit."""
+    def get_feed_names(self, user):
+        response = self.get_client(user).get("/api/recipes/feed/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe["name"] for recipe in response.data["results"]]
+
+    def test_recipes_posted_above_limit_stay_in_feed(self):
+        author = self.create_user("author")
+        reader = self.create_user("reader")
+        other_reader = self.create_user("other_reader")
+        Follow.objects.create(follower=reader, author=author)
+        self.create_recipe(author, name="Fanned out")
+        Follow.objects.create(follower=other_reader, author=author)
+        self.create_recipe(author, name="Pulled")
+        self.assertFalse(
+            TimelineEntry.objects.filter(recipe__name="Pulled").exists()
+        )
+        Follow.objects.filter(follower=other_reader).delete()
+        self.create_recipe(author, name="Fanned out again")
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=reader, recipe__name="Fanned out again"
+            ).exists()
+        )
+        self.assertEqual(
+            self.get_feed_names(reader),
+            ["Fanned out again", "Pulled", "Fanned out"],
+        )
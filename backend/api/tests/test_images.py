@@ -0,0 +1,104 @@
+"""Recipe images tests."""
+
+
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import override_settings
+from PIL import Image
+from rest_framework import serializers
+
+from api.tests.base import ApiTestCase
+from api.v1.fields import StreamingBase64ImageField
+from recipe import images
+from recipe.models import Recipe
+
+
+def get_png(width=40, height=20):
+    """Return bytes of a PNG image."""
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class StreamingBase64ImageFieldTests(ApiTestCase):
+    """A base64 payload is decoded by chunks."""
+    def setUp(self):
+        super().setUp()
+        self.field = StreamingBase64ImageField()
+        self.field.chunk_size = 8
+        self.png = get_png()
+        self.encoded = base64.b64encode(self.png).decode("ascii")
+
+    def test_decode_by_chunks(self):
+        for payload in (
+            self.encoded,
+            f"data:image/png;base64,{self.encoded}",
+        ):
+            with self.subTest(payload=payload[:22]):
+                decoded_file = self.field.decode(payload)
+                decoded_file.seek(0)
+                self.assertEqual(decoded_file.read(), self.png)
+
+    def test_image_is_validated(self):
+        uploaded = self.field.to_internal_value(self.encoded)
+        self.assertTrue(uploaded.name.endswith(".png"))
+        self.assertEqual(uploaded.size, len(self.png))
+        for payload in (
+            "data:image/png;base64,not base64!",
+            base64.b64encode(b"not an image").decode("ascii"),
+            123,
+        ):
+            with self.subTest(payload=payload):
+                with self.assertRaises(serializers.ValidationError):
+                    self.field.to_internal_value(payload)
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[10, 20])
+class ImageVariantsTests(ApiTestCase):
+    """Resized variants are made for a recipe image."""
+    def setUp(self):
+        super().setUp()
+        author = self.create_user("author")
+        self.recipe = self.create_recipe(author)
+        self.recipe.image.save("recipe.png", ContentFile(get_png()))
+
+    def test_variants_are_made(self):
+        images.make_variants(self.recipe.id)
+        for width in (10, 20):
+            name = images.get_variant_name(self.recipe.image.name, width)
+            with default_storage.open(name) as file, Image.open(file) as image:
+                self.assertEqual(image.format, "WEBP")
+                self.assertEqual(image.size, (width, width // 2))
+        self.assertTrue(
+            Recipe.objects.get(pk=self.recipe.pk).image_variants_ready
+        )
+
+    def test_variants_keep_a_caller_connection(self):
+        images.make_variants(self.recipe.id)
+        self.assertIsNotNone(connection.connection)
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+    def test_worker_errors_are_logged(self):
+        executor = ThreadPoolExecutor(1)
+        error = OSError("broken image")
+        with mock.patch.object(
+            images, "executor", executor
+        ), mock.patch.object(
+            images, "make_variants", side_effect=error
+        ), self.assertLogs("recipe.images", "ERROR") as logs:
+            images.submit_variants(self.recipe.id)
+            executor.shutdown(wait=True)
+        self.assertIn(
+            f"Image variants of recipe {self.recipe.id} failed.",
+            logs.output[0],
+        )
+        self.assertIn("broken image", logs.output[0])
+        self.assertFalse(
+            Recipe.objects.get(pk=self.recipe.pk).image_variants_ready
+        )
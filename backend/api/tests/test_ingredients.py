@@ -0,0 +1,73 @@
+"""Ingredients API tests."""
+
+
+from django.test import override_settings
+from rest_framework import status
+
+from api.tests.base import ApiTestCase
+
+NAMES = (
+    "сахар",
+    "сахарная пудра",
+    "мука",
+    "соль",
+    "ванильный сахар",
+    "тростниковый сахар",
+    "сыр",
+)
+
+
+class IngredientSearchTests(ApiTestCase):
+    """Name autocomplete of the search index and of the database."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create ingredients with shared name parts."""
+        for name in NAMES:
+            cls.create_ingredient(name)
+
+    def search(self, name):
+        """Return names of ingredients matching a name part."""
+        response = self.get_client().get(
+            "/api/ingredients/", {"name": name}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [ingredient["name"] for ingredient in response.data]
+
+    def assert_search(self):
+        """Assert ranking, short values and limits of a search."""
+        self.assertEqual(
+            self.search("Сахар"),
+            [
+                "сахар",
+                "сахарная пудра",
+                "ванильный сахар",
+                "тростниковый сахар",
+            ],
+        )
+        self.assertEqual(
+            self.search("с"), ["сахар", "сахарная пудра", "соль", "сыр"]
+        )
+        self.assertEqual(self.search("ах"), [])
+        with override_settings(INGREDIENT_SEARCH_LIMIT=3):
+            self.assertEqual(
+                self.search("сахар"),
+                ["сахар", "сахарная пудра", "ванильный сахар"],
+            )
+
+    def test_index_search(self):
+        self.assert_search()
+
+    @override_settings(INGREDIENT_SEARCH_INDEX_TIMEOUT=0)
+    def test_database_search(self):
+        self.assert_search()
+
+    def test_index_is_reloaded_after_catalog_changes(self):
+        self.assertEqual(self.search("мук"), ["мука"])
+        ingredient = self.create_ingredient("мускатный орех")
+        self.assertEqual(self.search("му"), ["мука", "мускатный орех"])
+        ingredient.name = "кокос"
+        ingredient.save()
+        self.assertEqual(self.search("му"), ["мука"])
+        self.assertEqual(self.search("кок"), ["кокос"])
+        ingredient.delete()
+        self.assertEqual(self.search("кок"), [])
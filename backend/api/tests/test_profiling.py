@@ -0,0 +1,49 @@
+"""Request profiling API tests."""
+
+
+import json
+
+from django.test import override_settings
+
+from api.tests.base import ApiTestCase
+from recipe.models import IsInShoppingCart
+
+
+@override_settings(REQUEST_PROFILING=True)
+class RequestProfilingTests(ApiTestCase):
+    """Timings are kept from clients, streamed responses are recorded."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create a user with a recipe in a shopping cart and a staff user."""
+        cls.user = cls.create_user("user")
+        cls.staff = cls.create_user("staff")
+        cls.staff.is_staff = True
+        cls.staff.save()
+        recipe = cls.create_recipe(
+            cls.user, ingredients=((cls.create_ingredient("salt"), 5),)
+        )
+        IsInShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def test_server_timing_is_sent_to_staff_only(self):
+        for user, debug, sent in (
+            (None, False, False),
+            (self.user, False, False),
+            (self.staff, False, True),
+            (None, True, True),
+        ):
+            with self.subTest(user=user, debug=debug):
+                with override_settings(DEBUG=debug):
+                    response = self.get_client(user).get("/api/tags/")
+                self.assertEqual(response.has_header("Server-Timing"), sent)
+
+    def test_streaming_response_is_recorded_when_streamed(self):
+        with self.assertLogs("api.profiling", "INFO") as logs:
+            response = self.get_client(self.user).get(
+                "/api/recipes/download_shopping_cart/"
+            )
+            self.assertEqual(logs.output, [])
+            content = b"".join(response.streaming_content)
+        data = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(data["view"], "recipes-download_shopping_cart")
+        self.assertEqual(data["size_bytes"], len(content))
+        self.assertGreaterEqual(data["queries"], 1)
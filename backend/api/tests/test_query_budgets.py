@@ -0,0 +1,201 @@
+"""Query budgets API tests."""
+
+
+from django.test import override_settings
+from django.urls import resolve
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.tests.base import IMAGE, ApiTransactionTestCase
+from api.v1.authentication import token_user_cache
+from recipe.models import IsFavorited, IsInShoppingCart, Recipe
+from users.models import Follow
+
+
+@override_settings(REQUEST_PROFILING=True, QUERY_BUDGET_STRICT=True)
+class QueryBudgetsTests(ApiTransactionTestCase):
+    """Every budgeted endpoint keeps its query budget in strict mode.
+
+    Requests authenticate by tokens missing in the token cache, so
+    budgets cover an authentication query too. Streaming responses are
+    read to the end, their queries count when they are streamed.
+    """
+    def setUp(self):
+        """Create recipes, follows, favorites and a shopping cart."""
+        super().setUp()
+        self.reader = self.create_user("reader")
+        self.author = self.create_user("author")
+        self.tags = [self.create_tag(f"tag{number}") for number in range(3)]
+        self.ingredients = [
+            self.create_ingredient(f"ingredient{number}")
+            for number in range(4)
+        ]
+        self.recipes = [
+            self.create_recipe(
+                author,
+                name=f"Recipe {number}",
+                ingredients=(
+                    (self.ingredients[number % 4], 100),
+                    (self.ingredients[(number + 1) % 4], 200),
+                ),
+                tags=self.tags[:2],
+            )
+            for number in range(4)
+            for author in (self.author, self.reader)
+        ]
+        Follow.objects.create(follower=self.reader, author=self.author)
+        for recipe in self.recipes[:3]:
+            IsFavorited.objects.create(user=self.reader, recipe=recipe)
+        for recipe in self.recipes[:3]:
+            IsInShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        self.covered = set()
+
+    def get_token_client(self, user):
+        """Return a client authenticated by a token of a user."""
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def request(self, client, method, url, data=None):
+        """Make a request with an empty token cache and mark its action."""
+        token_user_cache.entries.clear()
+        response = getattr(client, method)(url, data, format="json")
+        if response.streaming:
+            b"".join(response.streaming_content)
+        self.assertLess(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST,
+            f"{method.upper()} {url}",
+        )
+        match = resolve(url.split("?")[0])
+        self.covered.add((match.func.cls, match.func.actions[method]))
+        return response
+
+    def get_recipe_data(self):
+        """Return data of a recipe to create or update."""
+        return {
+            "name": "New recipe",
+            "text": "Recipe text.",
+            "cooking_time": 5,
+            "image": IMAGE,
+            "tags": [tag.id for tag in self.tags],
+            "ingredients": [
+                {"id": ingredient.id, "amount": 10}
+                for ingredient in self.ingredients
+            ],
+        }
+
+    def test_endpoints_keep_query_budgets(self):
+        anonymous = APIClient()
+        client = self.get_token_client(self.reader)
+        recipe = self.recipes[0]
+        other = self.recipes[-1]
+        ids = [item.id for item in self.recipes[3:6]]
+        tag = self.tags[0]
+        ingredient = self.ingredients[0]
+        author = self.author
+        for current in (anonymous, client):
+            self.request(current, "get", "/api/tags/")
+            self.request(current, "get", f"/api/tags/{tag.id}/")
+            self.request(current, "get", "/api/ingredients/")
+            self.request(current, "get", "/api/ingredients/?name=ingr")
+            self.request(current, "get", f"/api/ingredients/{ingredient.id}/")
+            self.request(current, "get", "/api/recipes/?limit=6")
+            self.request(
+                current,
+                "get",
+                f"/api/recipes/?tags={tag.slug}&author={author.id}",
+            )
+            self.request(current, "get", f"/api/recipes/{recipe.id}/")
+            self.request(
+                current,
+                "get",
+                f"/api/recipes/what_can_i_cook/?ingredients={ingredient.id}",
+            )
+            self.request(current, "get", "/api/users/?limit=6")
+            self.request(current, "get", f"/api/users/{author.id}/")
+        self.request(
+            client, "get", "/api/recipes/?is_favorited=1&is_in_shopping_cart=1"
+        )
+        self.request(client, "get", "/api/recipes/feed/")
+        self.request(client, "post", "/api/recipes/", self.get_recipe_data())
+        created_id = Recipe.objects.get(name="New recipe").id
+        self.request(
+            client,
+            "put",
+            f"/api/recipes/{created_id}/",
+            self.get_recipe_data(),
+        )
+        self.request(
+            client,
+            "patch",
+            f"/api/recipes/{created_id}/",
+            {**self.get_recipe_data(), "name": "Patched recipe"},
+        )
+        self.request(client, "get", f"/api/recipes/{other.id}/favorite/")
+        self.request(client, "delete", f"/api/recipes/{other.id}/favorite/")
+        self.request(
+            client, "post", "/api/recipes/favorite/batch/", {"recipes": ids}
+        )
+        self.request(
+            client, "delete", "/api/recipes/favorite/batch/", {"recipes": ids}
+        )
+        self.request(client, "get", f"/api/recipes/{other.id}/shopping_cart/")
+        self.request(
+            client,
+            "patch",
+            f"/api/recipes/{other.id}/shopping_cart/",
+            {"servings": 3},
+        )
+        self.request(
+            client, "delete", f"/api/recipes/{other.id}/shopping_cart/"
+        )
+        self.request(
+            client,
+            "post",
+            "/api/recipes/shopping_cart/batch/",
+            {"recipes": ids},
+        )
+        self.request(
+            client,
+            "delete",
+            "/api/recipes/shopping_cart/batch/",
+            {"recipes": ids},
+        )
+        self.request(client, "get", "/api/recipes/download_shopping_cart/")
+        self.request(client, "delete", f"/api/recipes/{recipe.id + 1}/")
+        self.request(client, "get", "/api/users/me/")
+        self.request(
+            client, "get", "/api/users/subscriptions/?limit=6&recipes_limit=2"
+        )
+        self.request(client, "delete", f"/api/users/{author.id}/subscribe/")
+        self.request(client, "get", f"/api/users/{author.id}/subscribe/")
+        self.request(
+            client,
+            "post",
+            "/api/users/set_password/",
+            {
+                "current_password": "test-password",
+                "new_password": "new-test-password",
+            },
+        )
+        self.request(
+            anonymous,
+            "post",
+            "/api/users/",
+            {
+                "username": "newcomer",
+                "email": "newcomer@example.com",
+                "password": "test-password",
+                "first_name": "Test",
+                "last_name": "newcomer",
+            },
+        )
+        budgeted = {
+            (view_class, action)
+            for view_class in {view_class for view_class, _ in self.covered}
+            for action in view_class.query_budgets
+        }
+        self.assertEqual(budgeted - self.covered, set())
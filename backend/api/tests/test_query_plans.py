@@ -0,0 +1,24 @@
+"""Query plans API tests."""
+
+
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.tests.base import ApiTestCase
+
+
+class QueryPlansTests(ApiTestCase):
+    """Hot queries of the API viewsets use indexes."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create a tagged recipe, so a tags filter is checked too."""
+        cls.create_recipe(
+            cls.create_user("author"), tags=[cls.create_tag("breakfast")]
+        )
+
+    def test_hot_queries_use_indexes(self):
+        stdout = StringIO()
+        call_command("check_query_plans", stdout=stdout)
+        self.assertIn("OK recipe feed by tags", stdout.getvalue())
+        self.assertIn("Every hot query uses indexes.", stdout.getvalue())
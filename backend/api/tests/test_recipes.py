@@ -0,0 +1,184 @@
+"""Recipes API tests."""
+
+
+from rest_framework import status
+
+from api.tests.base import IMAGE, ApiTestCase
+from api.v1.matching import recipe_match_index
+from recipe.models import IsFavorited, IsInShoppingCart
+
+
+class RecipeListQueriesTests(ApiTestCase):
+    """A recipes list makes the same queries for any page size."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create tagged recipes favorited and put in a cart by a reader."""
+        cls.reader = cls.create_user("reader")
+        author = cls.create_user("author")
+        ingredients = [
+            cls.create_ingredient(f"ingredient{number}")
+            for number in range(3)
+        ]
+        tags = [cls.create_tag("breakfast"), cls.create_tag("lunch")]
+        recipes = [
+            cls.create_recipe(
+                author,
+                name=f"Recipe {number}",
+                ingredients=[
+                    (ingredient, 100) for ingredient in ingredients
+                ],
+                tags=tags,
+            )
+            for number in range(12)
+        ]
+        IsFavorited.objects.add_pairs(
+            cls.reader.id, [recipe.id for recipe in recipes[::2]]
+        )
+        IsInShoppingCart.objects.add_pairs(
+            cls.reader.id, [recipe.id for recipe in recipes[::3]]
+        )
+
+    def assert_list_queries(self, client, num):
+        """Assert queries of recipes list pages of two sizes."""
+        for limit in (2, 10):
+            with self.subTest(limit=limit), self.assertNumQueries(num):
+                response = client.get(f"/api/recipes/?limit={limit}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), limit)
+            for recipe in response.data["results"]:
+                self.assertEqual(len(recipe["ingredients"]), 3)
+                self.assertEqual(len(recipe["tags"]), 2)
+
+    def test_anonymous_list_queries(self):
+        self.assert_list_queries(self.get_client(), 5)
+
+    def test_authenticated_list_queries(self):
+        client = self.get_client(self.reader)
+        self.assert_list_queries(client, 5)
+        response = client.get("/api/recipes/?limit=12")
+        results = response.data["results"]
+        self.assertEqual(
+            sum(recipe["is_favorited"] for recipe in results), 6
+        )
+        self.assertEqual(
+            sum(recipe["is_in_shopping_cart"] for recipe in results), 4
+        )
+
+
+class RecipeWriteQueriesTests(ApiTestCase):
+    """Recipe writes make the same queries for any number of portions."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create an author, a customer, tags and ingredients."""
+        cls.author = cls.create_user("author")
+        cls.customer = cls.create_user("customer")
+        cls.tags = [cls.create_tag(f"tag{number}") for number in range(3)]
+        cls.ingredients = [
+            cls.create_ingredient(f"ingredient{number}")
+            for number in range(60)
+        ]
+
+    def get_recipe_data(self, amounts, tags_count=3):
+        """Return recipe data with amounts of ingredients by positions."""
+        return {
+            "name": "Recipe",
+            "text": "Recipe text.",
+            "cooking_time": 5,
+            "image": IMAGE,
+            "tags": [tag.id for tag in self.tags[:tags_count]],
+            "ingredients": [
+                {"id": self.ingredients[position].id, "amount": amount}
+                for position, amount in amounts.items()
+            ],
+        }
+
+    def test_create_queries(self):
+        client = self.get_client(self.author)
+        for ingredients_count, tags_count in ((2, 1), (30, 3)):
+            amounts = dict.fromkeys(range(ingredients_count), 10)
+            with self.subTest(ingredients_count=ingredients_count):
+                with self.assertNumQueries(14):
+                    response = client.post(
+                        "/api/recipes/",
+                        self.get_recipe_data(amounts, tags_count),
+                        format="json",
+                    )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(
+                    len(response.data["ingredients"]), ingredients_count
+                )
+
+    def test_update_queries(self):
+        client = self.get_client(self.author)
+        for diff_size in (1, 10):
+            recipe = self.create_recipe(
+                self.author,
+                ingredients=[
+                    (ingredient, 10) for ingredient in self.ingredients[:30]
+                ],
+            )
+            IsInShoppingCart.objects.create(user=self.customer, recipe=recipe)
+            amounts = dict.fromkeys(range(diff_size, 30 + diff_size), 10)
+            amounts.update(dict.fromkeys(range(diff_size, 2 * diff_size), 20))
+            with self.subTest(diff_size=diff_size):
+                with self.assertNumQueries(20):
+                    response = client.put(
+                        f"/api/recipes/{recipe.id}/",
+                        self.get_recipe_data(amounts),
+                        format="json",
+                    )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    sorted(
+                        recipe.ingredients_in_portion.values_list(
+                            "ingredient__name", "amount"
+                        )
+                    ),
+                    sorted(
+                        (self.ingredients[position].name, amount)
+                        for position, amount in amounts.items()
+                    ),
+                )
+
+
+class RecipeMatchTests(ApiTestCase):
+    """Recipes are matched by available ingredients."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create recipes missing none, one and two of given ingredients."""
+        author = cls.create_user("author")
+        cls.ingredients = [
+            cls.create_ingredient(f"ingredient{number}")
+            for number in range(4)
+        ]
+        for number in range(3):
+            cls.create_recipe(
+                author,
+                name=f"Recipe {number}",
+                ingredients=[
+                    (ingredient, 100)
+                    for ingredient in cls.ingredients[:number + 2]
+                ],
+            )
+
+    def setUp(self):
+        """Load recipes of this test into the match index."""
+        super().setUp()
+        recipe_match_index.load()
+
+    def test_paginated_counts(self):
+        ids = ",".join(
+            str(ingredient.id) for ingredient in self.ingredients[:2]
+        )
+        for count in ("exact", "approximate"):
+            with self.subTest(count=count):
+                response = self.get_client().get(
+                    f"/api/recipes/what_can_i_cook/?ingredients={ids}"
+                    f"&max_missing=1&limit=1&count={count}"
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data["count"], 2)
+                self.assertEqual(
+                    [recipe["name"] for recipe in response.data["results"]],
+                    ["Recipe 0"],
+                )
@@ -0,0 +1,159 @@
+"""Shopping cart API tests."""
+
+
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.tests.base import ApiTestCase
+from recipe.models import (Ingredient, IngredientPortion, IsInShoppingCart,
+                           Recipe, ShoppingCartIngredient)
+
+
+class ShoppingCartServingsTests(ApiTestCase):
+    """Tests of changing servings of a cart item."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user("author")
+        cls.customer = cls.create_user("customer")
+        cls.other = cls.create_user("other")
+        cls.ingredient = cls.create_ingredient("flour")
+        cls.recipe = cls.create_recipe(
+            cls.author, "Bread", [(cls.ingredient, 200)]
+        )
+        cls.other_recipe = cls.create_recipe(
+            cls.author, "Cake", [(cls.ingredient, 300)]
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.get_client(self.customer)
+        self.url = f"/api/recipes/{self.recipe.id}/shopping_cart/"
+        self.assertEqual(self.client.get(self.url).status_code, 201)
+
+    def test_servings_change_totals(self):
+        response = self.client.patch(self.url, {"servings": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["servings"], 3)
+        total = ShoppingCartIngredient.objects.get(user=self.customer)
+        self.assertEqual(total.total_amount, 600)
+
+    def test_customer_and_recipe_can_not_be_changed(self):
+        for field, value in (
+            ("user", self.other.id),
+            ("recipe", self.other_recipe.id),
+        ):
+            with self.subTest(field=field):
+                response = self.client.patch(
+                    self.url, {field: value, "servings": 4}, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+        item = IsInShoppingCart.objects.get()
+        self.assertEqual(
+            (item.user_id, item.recipe_id, item.servings),
+            (self.customer.id, self.recipe.id, 1),
+        )
+        call_command(
+            "rebuild_cart_totals", verify_only=True, stdout=StringIO()
+        )
+
+
+class ShoppingCartTotalsTests(ApiTestCase):
+    """Tests of refreshing and rebuilding stored cart totals."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = cls.create_user("customer")
+        author = cls.create_user("author")
+        cls.ingredients = [
+            cls.create_ingredient(f"ingredient{number}")
+            for number in range(3)
+        ]
+        cls.recipe = cls.create_recipe(
+            author,
+            "Bread",
+            [(ingredient, 100) for ingredient in cls.ingredients],
+        )
+        IsInShoppingCart.objects.create(user=cls.customer, recipe=cls.recipe)
+
+    def get_totals(self):
+        """Return stored totals of the customer by ingredient names."""
+        return dict(
+            ShoppingCartIngredient.objects.filter(
+                user=self.customer
+            ).values_list("ingredient__name", "total_amount")
+        )
+
+    def test_refresh_updates_existing_and_deletes_gone_totals(self):
+        ids = [ingredient.id for ingredient in self.ingredients]
+        ShoppingCartIngredient.objects.refresh([self.customer.id], ids)
+        self.recipe.ingredients_in_portion.filter(
+            ingredient=self.ingredients[0]
+        ).delete()
+        IsInShoppingCart.objects.filter(user=self.customer).update(servings=2)
+        ShoppingCartIngredient.objects.refresh([self.customer.id], ids)
+        self.assertEqual(
+            self.get_totals(), {"ingredient1": 200, "ingredient2": 200}
+        )
+
+    def assert_totals(self, totals):
+        """Assert stored totals of the customer and of every user."""
+        self.assertEqual(self.get_totals(), totals)
+        call_command(
+            "rebuild_cart_totals", verify_only=True, stdout=StringIO()
+        )
+
+    def test_orm_recipe_deletes_refresh_totals(self):
+        recipe = Recipe.objects.select_related("author").get(pk=self.recipe.pk)
+        author = recipe.author
+        cake = self.create_recipe(author, "Cake", [(self.ingredients[0], 50)])
+        pie = self.create_recipe(author, "Pie", [(self.ingredients[1], 70)])
+        IsInShoppingCart.objects.create(user=self.customer, recipe=cake)
+        IsInShoppingCart.objects.create(user=self.customer, recipe=pie)
+        self.assert_totals(
+            {"ingredient0": 150, "ingredient1": 170, "ingredient2": 100}
+        )
+        recipe.delete()
+        self.assert_totals({"ingredient0": 50, "ingredient1": 70})
+        Recipe.objects.filter(pk=cake.pk).delete()
+        self.assert_totals({"ingredient1": 70})
+        author.delete()
+        self.assert_totals({})
+
+    def test_orm_portion_and_cart_changes_refresh_totals(self):
+        portion = IngredientPortion.objects.get(
+            recipe=self.recipe, ingredient=self.ingredients[0]
+        )
+        portion.amount = 40
+        portion.ingredient = self.create_ingredient("salt")
+        portion.save()
+        self.assert_totals(
+            {"ingredient1": 100, "ingredient2": 100, "salt": 40}
+        )
+        portion.delete()
+        self.assert_totals({"ingredient1": 100, "ingredient2": 100})
+        IngredientPortion.objects.create(
+            recipe=self.recipe, ingredient=self.ingredients[0], amount=10
+        )
+        item = IsInShoppingCart.objects.get(user=self.customer)
+        item.servings = 2
+        item.save()
+        self.assert_totals(
+            {"ingredient0": 20, "ingredient1": 200, "ingredient2": 200}
+        )
+        item.delete()
+        self.assert_totals({})
+
+    def test_rebuild_clamps_batch_size(self):
+        author = self.create_user("many")
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"bulk{number}", measurement_unit="г")
+            for number in range(600)
+        )
+        ingredients = Ingredient.objects.filter(name__startswith="bulk")
+        recipe = self.create_recipe(
+            author, "Many", [(ingredient, 1) for ingredient in ingredients]
+        )
+        IsInShoppingCart.objects.create(user=self.customer, recipe=recipe)
+        call_command("rebuild_cart_totals", batch_size=1000, stdout=StringIO())
+        self.assertEqual(len(self.get_totals()), 603)
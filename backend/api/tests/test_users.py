@@ -0,0 +1,70 @@
+"""Users API tests."""
+
+
+from rest_framework import status
+
+from api.tests.base import ApiTestCase
+from users.models import Follow
+
+
+class UserListQueriesTests(ApiTestCase):
+    """A users list makes the same queries for any page size."""
+    @classmethod
+    def setUpTestData(cls):
+        """Create users followed by a reader."""
+        cls.reader = cls.create_user("reader")
+        for number in range(12):
+            author = cls.create_user(f"author{number}")
+            if number % 2:
+                Follow.objects.create(follower=cls.reader, author=author)
+
+    def assert_list_queries(self, client, num):
+        """Assert queries of users list pages of two sizes."""
+        for limit in (2, 10):
+            with self.subTest(limit=limit), self.assertNumQueries(num):
+                response = client.get(f"/api/users/?limit={limit}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), limit)
+
+    def test_anonymous_list_queries(self):
+        client = self.get_client()
+        self.assert_list_queries(client, 2)
+        response = client.get("/api/users/?limit=13")
+        self.assertFalse(
+            any(user["is_subscribed"] for user in response.data["results"])
+        )
+
+    def test_authenticated_list_queries(self):
+        client = self.get_client(self.reader)
+        self.assert_list_queries(client, 2)
+        response = client.get("/api/users/?limit=13")
+        self.assertEqual(
+            sum(user["is_subscribed"] for user in response.data["results"]),
+            6,
+        )
+
+
+class SetPasswordQueriesTests(ApiTestCase):
+    """A password change loads a current user once.
+
+    Queries are a user read, its update and a token lookup evicting
+    cached tokens of the user.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        """Create a user."""
+        cls.user = cls.create_user("user")
+
+    def test_set_password_queries(self):
+        client = self.get_client(self.user)
+        with self.assertNumQueries(3):
+            response = client.post(
+                "/api/users/set_password/",
+                {
+                    "current_password": "test-password",
+                    "new_password": "new-test-password",
+                },
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-test-password"))
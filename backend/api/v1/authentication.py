@@ -0,0 +1,198 @@
+"""API v.1 cached token authentication."""
+
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from users.models import users_updated
+
+User = get_user_model()
+
+
+def get_token_cache_key(key):
+    """Return a shared cache key of a token user."""
+    return f"auth:token:{key}"
+
+
+def get_token_version_key(key):
+    """Return a shared cache key of a token version."""
+    return f"auth:token-version:{key}"
+
+
+class TokenUserCache:
+    """Versioned cache of token users.
+
+    Users are kept in the shared cache if a shared timeout is set, so an
+    invalidation is seen by every process at once. Otherwise a bounded
+    in-process LRU is used, it suits a single process only, others keep
+    a revoked token until a local timeout expires.
+
+    A user is stored with a version of a token read before a database
+    query. An invalidation changes versions after a commit, so a user
+    read before it is never returned from the cache.
+    """
+    def __init__(self, max_size, local_timeout, shared_timeout):
+        self.max_size = max_size
+        self.local_timeout = local_timeout
+        self.shared_timeout = shared_timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.local_version = 0
+
+    def get_local(self, key):
+        """Return a user from the LRU if it is not expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set_local(self, key, user, version):
+        """Put a user to the LRU if nothing is invalidated since a version.
+
+        The least recently used users are evicted.
+        """
+        with self.lock:
+            if version != self.local_version:
+                return
+            self.entries[key] = (user, time.monotonic() + self.local_timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        """Return a cached user of a token key and a version of the key.
+
+        A version is passed to the set method after a database query.
+        """
+        if not self.shared_timeout:
+            with self.lock:
+                version = self.local_version
+            return self.get_local(key), version
+        cache_key = get_token_cache_key(key)
+        version_key = get_token_version_key(key)
+        values = cache.get_many([cache_key, version_key])
+        version = values.get(version_key)
+        entry = values.get(cache_key)
+        if entry is None or entry[0] != version:
+            return None, version
+        return entry[1], version
+
+    def set(self, key, user, version):
+        """Cache a user of a token key read at a version of the key."""
+        if not self.shared_timeout:
+            self.set_local(key, user, version)
+            return
+        cache.set(
+            get_token_cache_key(key), (version, user), self.shared_timeout
+        )
+
+    def change_versions(self, keys):
+        """Drop cached users of token keys changing their versions.
+
+        Shared versions outlive users cached before a change.
+        """
+        if not self.shared_timeout:
+            with self.lock:
+                self.local_version += 1
+                for key in keys:
+                    self.entries.pop(key, None)
+            return
+        version = uuid.uuid4().hex
+        cache.set_many(
+            {get_token_version_key(key): version for key in keys},
+            self.shared_timeout * 2,
+        )
+
+    def invalidate(self, keys, using=DEFAULT_DB_ALIAS):
+        """Drop cached users of token keys after a commit."""
+        keys = list(keys)
+        if keys:
+            transaction.on_commit(
+                partial(self.change_versions, keys), using=using
+            )
+
+    def invalidate_users(self, users_ids, using=DEFAULT_DB_ALIAS):
+        """Drop every cached token of users."""
+        users_ids = set(users_ids)
+        keys = set(
+            Token.objects.using(using)
+            .filter(user_id__in=users_ids)
+            .values_list("key", flat=True)
+        )
+        with self.lock:
+            keys.update(
+                key
+                for key, (user, _) in self.entries.items()
+                if user.pk in users_ids
+            )
+        self.invalidate(keys, using)
+
+
+token_user_cache = TokenUserCache(
+    max_size=settings.TOKEN_CACHE_SIZE,
+    local_timeout=settings.TOKEN_CACHE_LOCAL_TIMEOUT,
+    shared_timeout=settings.TOKEN_CACHE_TIMEOUT,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication with cached users of tokens.
+
+    Steady-state requests skip the token and user query. Cached users
+    are dropped on logout, on any user change and on deactivation, bulk
+    updates of users included.
+    """
+    def authenticate_credentials(self, key):
+        """Redefinition authenticate_credentials method."""
+        user, version = token_user_cache.get(key)
+        if user is not None:
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        token_user_cache.set(key, user, version)
+        return user, token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Drop a cached user of a deleted token, logout included."""
+    token_user_cache.invalidate([instance.key], kwargs["using"])
+
+
+@receiver(post_save, sender=User)
+def invalidate_changed_user_tokens(
+    sender, instance, created, update_fields, **kwargs
+):
+    """Drop cached tokens of a changed user.
+
+    A password change and a deactivation are saved here too, a new user
+    and a last login update made on every login are skipped.
+    """
+    if created or (
+        update_fields is not None and set(update_fields) == {"last_login"}
+    ):
+        return
+    token_user_cache.invalidate_users([instance.pk], kwargs["using"])
+
+
+@receiver(users_updated, sender=User)
+def invalidate_updated_users_tokens(sender, users_ids, using, **kwargs):
+    """Drop cached tokens of users changed by a queryset update."""
+    token_user_cache.invalidate_users(users_ids, using)
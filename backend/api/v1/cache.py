@@ -0,0 +1,63 @@
+"""API v.1 catalog cache."""
+
+
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipe.models import Ingredient, Tag
+
+PER_PROCESS_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+
+
+def get_catalog_version_key(model):
+    """Return a cache key of a catalog version."""
+    return f"catalog:{model._meta.label_lower}:version"
+
+
+def get_catalog_version(model):
+    """Return a catalog version as a timestamp of its last change."""
+    return cache.get_or_set(get_catalog_version_key(model), time.time, None)
+
+
+def invalidate_catalog(model):
+    """Start a new catalog version, old cached responses become stale."""
+    cache.set(get_catalog_version_key(model), time.time(), None)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog_on_change(sender, **kwargs):
+    """Invalidate a catalog cache on any object change, admin included."""
+    invalidate_catalog(sender)
+
+
+@checks.register()
+def check_shared_cache(app_configs, **kwargs):
+    """Warn if catalog versions are not shared by worker processes.
+
+    A per-process cache keeps a version of every worker apart, so other
+    workers answer with stale catalogs after a change. It is fine for
+    one development process.
+    """
+    backend = settings.CACHES[DEFAULT_CACHE_ALIAS]["BACKEND"]
+    if backend not in PER_PROCESS_CACHE_BACKENDS:
+        return []
+    return [
+        checks.Warning(
+            f"{backend} keeps catalog versions in one worker process.",
+            hint=(
+                "Set CACHE_BACKEND to django_redis.cache.RedisCache in "
+                "production or with more than one worker process."
+            ),
+            id="api.W001",
+        )
+    ]
@@ -0,0 +1,109 @@
+"""API v.1 read replica routing and connection health checks."""
+
+
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+REPLICA_ALIAS_PREFIX = "replica_"
+
+replica_state = threading.local()
+
+
+def get_replica_aliases():
+    """Return aliases of configured read replicas."""
+    return [
+        alias
+        for alias in settings.DATABASES
+        if alias.startswith(REPLICA_ALIAS_PREFIX)
+    ]
+
+
+def get_primary_pin_key(user_id):
+    """Return a shared cache key of a user pinned to the primary."""
+    return f"db:primary:{user_id}"
+
+
+def pin_to_primary(user):
+    """Send reads of a user to the primary for a sticky timeout.
+
+    A shared cache backend makes a pin visible to every worker.
+    """
+    if settings.DB_REPLICA_STICKY_TIMEOUT and get_replica_aliases():
+        cache.set(
+            get_primary_pin_key(user.pk),
+            True,
+            settings.DB_REPLICA_STICKY_TIMEOUT,
+        )
+
+
+def is_pinned_to_primary(user):
+    """Return True if a user has written recently."""
+    return bool(
+        user.is_authenticated and cache.get(get_primary_pin_key(user.pk))
+    )
+
+
+def use_replica(user):
+    """Read from one random replica in a current thread if it is allowed.
+
+    Anonymous users and users without a recent write are allowed.
+    """
+    aliases = get_replica_aliases()
+    if aliases and not is_pinned_to_primary(user):
+        replica_state.alias = random.choice(aliases)
+
+
+def use_primary():
+    """Read from the primary in a current thread."""
+    replica_state.alias = None
+
+
+class ReplicaRouter:
+    """Database router sending reads of API requests to replicas.
+
+    Reads go to a replica only between use_replica and use_primary
+    calls, so management commands and writes always use the primary.
+    """
+    def db_for_read(self, model, **hints):
+        """Return a replica alias chosen for a current thread if any."""
+        return getattr(replica_state, "alias", None)
+
+    def db_for_write(self, model, **hints):
+        """Return the primary alias."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations, replicas have the same data as the primary."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Allow migrations on the primary only."""
+        return db == DEFAULT_DB_ALIAS
+
+
+@receiver(request_started)
+def check_connections_health(**kwargs):
+    """Close persistent connections which are not usable any more.
+
+    A connection is checked once per health check interval, so a broken
+    connection is reopened before a request fails on it.
+    """
+    interval = settings.DB_HEALTH_CHECK_INTERVAL
+    if not interval:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if now - getattr(connection, "health_checked_at", 0) < interval:
+            continue
+        connection.health_checked_at = now
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,86 @@
+"""API v.1 shopping cart exporters."""
+
+
+import csv
+import io
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+SHOPPING_CART_TITLE = "Мой список покупок:"
+PDF_FONT_NAME = "ShoppingCartFont"
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+
+
+class Echo:
+    """Pseudo-buffer which returns a written value instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def txt_export(items):
+    """Yield a shopping cart as plain text lines."""
+    yield f"{SHOPPING_CART_TITLE} \n"
+    for item in items:
+        yield (
+            f"{item['name']} "
+            f"- {item['total_amount']} "
+            f"({item['measurement_unit']})\n"
+        )
+
+
+def csv_export(items):
+    """Yield a shopping cart as CSV rows."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "amount", "measurement_unit"))
+    for item in items:
+        yield writer.writerow(
+            (item["name"], item["total_amount"], item["measurement_unit"])
+        )
+
+
+def get_pdf_font():
+    """Register a font with cyrillic glyphs once and return its name."""
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    try:
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT)
+        )
+    except Exception:
+        return "Helvetica"
+    return PDF_FONT_NAME
+
+
+def pdf_export(items):
+    """Yield a shopping cart as a PDF document.
+
+    A PDF cross-reference table needs every page to be written first,
+    so pages are drawn one by one and the document is sent afterwards.
+    """
+    buffer = io.BytesIO()
+    font_name = get_pdf_font()
+    width, height = A4
+    document = canvas.Canvas(buffer, pagesize=A4)
+    document.setFont(font_name, PDF_FONT_SIZE)
+    y_position = height - PDF_MARGIN
+    for line in txt_export(items):
+        if y_position < PDF_MARGIN:
+            document.showPage()
+            document.setFont(font_name, PDF_FONT_SIZE)
+            y_position = height - PDF_MARGIN
+        document.drawString(PDF_MARGIN, y_position, line.rstrip())
+        y_position -= PDF_FONT_SIZE * 1.5
+    document.save()
+    yield buffer.getvalue()
+
+
+SHOPPING_CART_EXPORTERS = {
+    "txt": ("text/plain; charset=utf-8", txt_export),
+    "csv": ("text/csv; charset=utf-8", csv_export),
+    "pdf": ("application/pdf", pdf_export),
+}
@@ -0,0 +1,100 @@
+"""API v.1 custom fields."""
+
+
+import base64
+import binascii
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+from recipe.images import get_variant_name
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """Base64ImageField which decodes a payload by chunks.
+
+    A decoded image goes to a spooled temporary file, so a request does
+    not keep one more full copy of an image in memory.
+    """
+    chunk_size = 64 * 1024
+
+    def decode(self, base64_data):
+        """Decode a base64 payload to a spooled temporary file."""
+        start = base64_data.find(";base64,")
+        start = 0 if start == -1 else start + len(";base64,")
+        decoded_file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            for position in range(start, len(base64_data), self.chunk_size):
+                decoded_file.write(
+                    base64.b64decode(
+                        base64_data[position:position + self.chunk_size],
+                        validate=True,
+                    )
+                )
+        except (binascii.Error, ValueError):
+            decoded_file.close()
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        return decoded_file
+
+    def get_image_extension(self, decoded_file):
+        """Return an extension of a decoded image."""
+        decoded_file.seek(0)
+        try:
+            with Image.open(decoded_file) as image:
+                extension = image.format.lower()
+                image.verify()
+        except Exception:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        extension = "jpg" if extension == "jpeg" else extension
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        return extension
+
+    def to_internal_value(self, base64_data):
+        """Redefinition to_internal_value method."""
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        decoded_file = self.decode(base64_data)
+        extension = self.get_image_extension(decoded_file)
+        size = decoded_file.seek(0, 2)
+        decoded_file.seek(0)
+        return serializers.ImageField.to_internal_value(
+            self,
+            UploadedFile(
+                file=decoded_file,
+                name=f"{uuid.uuid4()}.{extension}",
+                size=size,
+            ),
+        )
+
+
+class ImageVariantsField(serializers.Field):
+    """Read-only field with URLs of resized recipe image variants."""
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        """Return widths and URLs of image variants which are ready."""
+        if not recipe.image_variants_ready:
+            return []
+        request = self.context.get("request")
+        variants = []
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            url = default_storage.url(
+                get_variant_name(recipe.image.name, width)
+            )
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            variants.append({"width": width, "url": url})
+        return variants
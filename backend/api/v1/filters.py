@@ -2,11 +2,18 @@
 
 
 from django_filters.filters import (AllValuesMultipleFilter, BooleanFilter,
-                                    CharFilter, NumberFilter)
+                                    CharFilter, ChoiceFilter, NumberFilter)
 from django_filters.rest_framework import FilterSet
 
+from api.v1.search import rank_ingredients_by_name, search_recipes
 from recipe.models import Ingredient, Recipe
 
+RECIPE_ORDERINGS = {
+    "popular": ("-favorites_count", "-pub_date", "-id"),
+    "trending": ("-trending_score", "-pub_date", "-id"),
+    "cooking_time": ("cooking_time", "-pub_date", "-id"),
+}
+
 
 class RecipeFilter(FilterSet):
     """Recipe custom filter."""
@@ -22,6 +29,12 @@ class RecipeFilter(FilterSet):
         method="get_is_added",
         label="Is in shopping cart",
     )
+    search = CharFilter(method="get_search", label="Search")
+    ordering = ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in RECIPE_ORDERINGS],
+        method="get_ordering",
+        label="Ordering",
+    )
 
     def get_is_added(self, queryset, field_name, value):
         """Definition get_is_added method."""
@@ -31,14 +44,33 @@ class RecipeFilter(FilterSet):
             queryset = queryset.filter(**kwargs)
             return queryset
 
+    def get_search(self, queryset, field_name, value):
+        """Definition get_search method."""
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, field_name, value):
+        """Definition get_ordering method."""
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     class Meta:
         model = Recipe
-        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "tags",
+            "author",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+            "ordering",
+        )
 
 
 class IngredientFilter(FilterSet):
     """Ingredient custom filter."""
-    name = CharFilter(field_name="name", lookup_expr="istartswith")
+    name = CharFilter(field_name="name", method="get_name_matches")
+
+    def get_name_matches(self, queryset, field_name, value):
+        """Definition get_name_matches method."""
+        return rank_ingredients_by_name(queryset, value)
 
     class Meta:
         model = Ingredient
@@ -0,0 +1,143 @@
+"""API v.1 recipe matching by available ingredients."""
+
+
+import bisect
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from recipe.models import IngredientPortion, Recipe
+
+SYNC_OVERLAP = timedelta(seconds=60)
+LOAD_CHUNK_SIZE = 10000
+
+
+class RecipeIngredientIndex:
+    """In-process inverted index from ingredients to recipes.
+
+    Every ingredient keeps a sorted array of ids of recipes using it, so
+    a match only counts postings of given ingredients. Writes of this
+    process are applied at once, writes of other processes are picked
+    up by recipe update dates every refresh interval, the whole index is
+    reloaded after a timeout.
+    """
+    def __init__(self, timeout, refresh_interval):
+        self.timeout = timeout
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.postings = {}
+        self.recipe_ingredients = {}
+        self.loaded_at = None
+        self.checked_at = None
+        self.synced_until = None
+
+    def load(self):
+        """Load every recipe ingredient and rebuild the index."""
+        synced_until = timezone.now()
+        recipe_ingredients = defaultdict(list)
+        portions = IngredientPortion.objects.order_by().values_list(
+            "recipe", "ingredient"
+        )
+        for recipe_id, ingredient_id in portions.iterator(
+            chunk_size=LOAD_CHUNK_SIZE
+        ):
+            recipe_ingredients[recipe_id].append(ingredient_id)
+        postings = defaultdict(list)
+        for recipe_id in sorted(recipe_ingredients):
+            for ingredient_id in recipe_ingredients[recipe_id]:
+                postings[ingredient_id].append(recipe_id)
+        with self.lock:
+            self.postings = {
+                ingredient_id: array("l", recipes_ids)
+                for ingredient_id, recipes_ids in postings.items()
+            }
+            self.recipe_ingredients = {
+                recipe_id: tuple(ingredients_ids)
+                for recipe_id, ingredients_ids in recipe_ingredients.items()
+            }
+        self.loaded_at = self.checked_at = time.monotonic()
+        self.synced_until = synced_until
+
+    def sync(self):
+        """Apply recipes changed since the last sync."""
+        synced_until = timezone.now()
+        changed_ids = list(
+            Recipe.objects.filter(
+                updated_at__gt=self.synced_until - SYNC_OVERLAP
+            ).values_list("id", flat=True)
+        )
+        if changed_ids:
+            recipe_ingredients = {recipe_id: [] for recipe_id in changed_ids}
+            for recipe_id, ingredient_id in IngredientPortion.objects.filter(
+                recipe__in=changed_ids
+            ).values_list("recipe", "ingredient"):
+                recipe_ingredients[recipe_id].append(ingredient_id)
+            self.update_recipes(recipe_ingredients)
+        self.checked_at = time.monotonic()
+        self.synced_until = synced_until
+
+    def ensure_fresh(self):
+        """Reload an expired index or sync a stale one."""
+        now = time.monotonic()
+        if self.loaded_at is None or now - self.loaded_at > self.timeout:
+            self.load()
+        elif now - self.checked_at > self.refresh_interval:
+            self.sync()
+
+    def update_recipes(self, recipe_ingredients):
+        """Replace ingredients of recipes, empty ones remove a recipe."""
+        with self.lock:
+            for recipe_id, ingredients_ids in recipe_ingredients.items():
+                for ingredient_id in self.recipe_ingredients.pop(
+                    recipe_id, ()
+                ):
+                    posting = self.postings[ingredient_id]
+                    del posting[bisect.bisect_left(posting, recipe_id)]
+                ingredients_ids = tuple(set(ingredients_ids))
+                if not ingredients_ids:
+                    continue
+                self.recipe_ingredients[recipe_id] = ingredients_ids
+                for ingredient_id in ingredients_ids:
+                    bisect.insort(
+                        self.postings.setdefault(ingredient_id, array("l")),
+                        recipe_id,
+                    )
+
+    def remove_recipes(self, recipes_ids):
+        """Remove recipes from the index."""
+        self.update_recipes({recipe_id: () for recipe_id in recipes_ids})
+
+    def match(self, ingredients_ids, max_missing=None):
+        """Return (recipe id, missing count, matched count) by coverage.
+
+        Recipes missing fewer ingredients go first, then recipes using
+        more of given ones, then newer recipes.
+        """
+        self.ensure_fresh()
+        matched_counts = Counter()
+        with self.lock:
+            for ingredient_id in set(ingredients_ids):
+                matched_counts.update(self.postings.get(ingredient_id, ()))
+            matches = [
+                (
+                    recipe_id,
+                    len(self.recipe_ingredients[recipe_id]) - matched_count,
+                    matched_count,
+                )
+                for recipe_id, matched_count in matched_counts.items()
+            ]
+        if max_missing is not None:
+            matches = [match for match in matches if match[1] <= max_missing]
+        matches.sort(key=lambda match: (match[1], -match[2], -match[0]))
+        return matches
+
+
+recipe_match_index = RecipeIngredientIndex(
+    timeout=settings.RECIPE_MATCH_INDEX_TIMEOUT,
+    refresh_interval=settings.RECIPE_MATCH_REFRESH_INTERVAL,
+)
@@ -1,7 +1,20 @@
 """API v.1 custom mixins."""
 
 
-from rest_framework import mixins, viewsets
+import hashlib
+from functools import partial
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import mixins, status, viewsets
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from api.v1.cache import get_catalog_version
+from api.v1.databases import pin_to_primary, use_primary, use_replica
 
 
 class CreateListRetrieveViewSet(
@@ -12,3 +25,190 @@ class CreateListRetrieveViewSet(
 ):
     """Custom ViewSet only for POST and GET methods."""
     pass
+
+
+class CachedCatalogMixin:
+    """Cache list and retrieve responses of a read-only catalog ViewSet.
+
+    Responses are keyed by a catalog version and a full request path,
+    conditional GET is answered with ETag and Last-Modified headers.
+    Last-Modified has whole seconds only, so If-Modified-Since is compared
+    with a full version and never hides a change made in the same second.
+    """
+    def get_cached_response(self, request, get_response):
+        """Return a cached response or build and cache a new one."""
+        version = get_catalog_version(self.queryset.model)
+        cache_key = (
+            f"catalog:{self.queryset.model._meta.label_lower}:"
+            f"{version}:{request.get_full_path()}"
+        )
+        etag = 'W/"{}"'.format(
+            hashlib.md5(cache_key.encode("utf-8")).hexdigest()
+        )
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if_modified_since = parse_http_date_safe(
+            request.META.get("HTTP_IF_MODIFIED_SINCE", "")
+        )
+        if (if_none_match and etag in if_none_match) or (
+            if_none_match is None
+            and if_modified_since is not None
+            and if_modified_since >= version
+        ):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(cache_key)
+            if data is None:
+                data = get_response().data
+                cache.set(cache_key, data, settings.CATALOG_CACHE_TIMEOUT)
+            response = Response(data)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(version)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Redefinition list method."""
+        return self.get_cached_response(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Redefinition retrieve method."""
+        return self.get_cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs)
+        )
+
+
+class ConditionalGetMixin:
+    """Answer conditional list and retrieve requests with 304.
+
+    A weak ETag is made of etag_fields values of a filtered and paginated
+    queryset without prefetched relations, so an unchanged payload is
+    never serialized to compare. Dotted etag_fields follow loaded
+    relations. A count and links of a list page are a part of an ETag
+    too. A list page is loaded once, relations are prefetched for it only
+    if it is sent.
+    """
+    etag_fields = ()
+
+    def get_etag_version(self):
+        """Return a version of related data which is not in etag_fields."""
+        return ""
+
+    def get_etag(self, request, rows):
+        """Return a weak ETag for a request and etag_fields values."""
+        digest = hashlib.md5()
+        for part in (
+            request.get_full_path(),
+            str(request.user.pk),
+            str(self.get_etag_version()),
+            repr(list(rows)),
+        ):
+            digest.update(part.encode("utf-8"))
+        return f'W/"{digest.hexdigest()}"'
+
+    def get_etag_queryset(self):
+        """Return a queryset without prefetched relations.
+
+        Prefetch lookups are kept to load relations of a sent page.
+        """
+        queryset = self.get_queryset()
+        self.prefetch_lookups = queryset._prefetch_related_lookups
+        return queryset.prefetch_related(None)
+
+    def get_etag_rows(self, items):
+        """Return etag_fields values of items."""
+        get_values = attrgetter(*self.etag_fields)
+        return [get_values(item) for item in items]
+
+    def get_page_info(self):
+        """Return a count and links of a paginated page without results."""
+        return [
+            (key, value)
+            for key, value in self.get_paginated_response([]).data.items()
+            if key != "results"
+        ]
+
+    def get_conditional_response(self, request, rows, get_response):
+        """Return 304 if a client has a current version of a payload."""
+        etag = self.get_etag(request, rows)
+        if etag in request.META.get("HTTP_IF_NONE_MATCH", ""):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = get_response()
+        response["ETag"] = etag
+        return response
+
+    def get_list_response(self, items, paginated):
+        """Return a response with serialized items of a loaded page."""
+        prefetch_related_objects(items, *self.prefetch_lookups)
+        serializer = self.get_serializer(items, many=True)
+        if paginated:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        """Redefinition list method."""
+        queryset = self.filter_queryset(self.get_etag_queryset())
+        page = self.paginate_queryset(queryset)
+        items = list(queryset) if page is None else page
+        rows = self.get_etag_rows(items)
+        if page is not None:
+            rows.append(self.get_page_info())
+        return self.get_conditional_response(
+            request,
+            rows,
+            partial(self.get_list_response, items, page is not None),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Redefinition retrieve method."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        items = self.get_etag_queryset().filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self.get_conditional_response(
+            request,
+            self.get_etag_rows(items),
+            partial(super().retrieve, request, *args, **kwargs),
+        )
+
+
+class ReplicaReadMixin:
+    """Read from a replica while handling safe requests of a ViewSet.
+
+    Actions named in primary_actions change data on safe methods too,
+    they always use the primary. A user who has written through a ViewSet
+    is pinned to the primary for DB_REPLICA_STICKY_TIMEOUT seconds, so
+    own writes are read back.
+    """
+    primary_actions = ()
+
+    def is_write_request(self, request):
+        """Return True if a request may change data."""
+        return (
+            request.method not in SAFE_METHODS
+            or self.action in self.primary_actions
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        """Redefinition dispatch method."""
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            use_primary()
+
+    def initial(self, request, *args, **kwargs):
+        """Redefinition initial method."""
+        super().initial(request, *args, **kwargs)
+        if not self.is_write_request(request):
+            use_replica(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Redefinition finalize_response method."""
+        if (
+            self.is_write_request(request)
+            and response.status_code < status.HTTP_400_BAD_REQUEST
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
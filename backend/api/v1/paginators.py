@@ -1,9 +1,255 @@
 """API v.1 custom paginators."""
 
 
-from rest_framework.pagination import PageNumberPagination
+import heapq
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+APPROXIMATE_COUNT = "approximate"
+NO_COUNT = "none"
+
+
+def get_approximate_count(queryset):
+    """Return a planner row estimate on PostgreSQL, an exact count else.
+
+    A list, e.g. of in-memory matches, is counted by its length.
+    """
+    if not isinstance(queryset, QuerySet):
+        return len(queryset)
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class ApproximateCountPaginator(DjangoPaginator):
+    """Django paginator with an approximate objects count."""
+    @cached_property
+    def count(self):
+        return get_approximate_count(self.object_list)
 
 
 class PageSizeInParamsPagination(PageNumberPagination):
-    """Custom paginator with a page size in query param."""
+    """Custom paginator with a page size in query param.
+
+    A count=approximate query param switches to a row estimate count.
+    """
     page_size_query_param = "limit"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Redefinition paginate_queryset method."""
+        if request.query_params.get(self.count_query_param) == (
+            APPROXIMATE_COUNT
+        ):
+            self.django_paginator_class = ApproximateCountPaginator
+        return super().paginate_queryset(queryset, request, view=view)
+
+
+class KeysetPagination(BasePagination):
+    """Keyset paginator over (pub_date, id) in a descending order.
+
+    Every page is one indexed range query whatever its depth. A count is
+    skipped unless a count query param asks for an exact or approximate
+    one.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    count_query_param = "count"
+    page_size = 10
+    ordering = ("-pub_date", "-id")
+
+    def get_page_size(self, request):
+        """Return a page size from a query param or a default one."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return page_size
+
+    def decode_cursor(self, request):
+        """Return a (pub_date, id) position from a cursor query param."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            pub_date, pk = b64decode(encoded.encode("ascii")).decode(
+                "ascii"
+            ).split("|")
+            position = (parse_datetime(pub_date), int(pk))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound("Invalid cursor.")
+        if position[0] is None:
+            raise NotFound("Invalid cursor.")
+        return position
+
+    def encode_cursor(self, item):
+        """Return a cursor query param value for an item position."""
+        return self.encode_position(item.pub_date, item.pk)
+
+    def encode_position(self, pub_date, pk):
+        """Return a cursor query param value for a (pub_date, id) pair."""
+        position = f"{pub_date.isoformat()}|{pk}"
+        return b64encode(position.encode("ascii")).decode("ascii")
+
+    def get_count(self, queryset, request):
+        """Return a count asked by a count query param."""
+        count_mode = request.query_params.get(self.count_query_param, NO_COUNT)
+        if count_mode == NO_COUNT:
+            return None
+        if count_mode == APPROXIMATE_COUNT:
+            return get_approximate_count(queryset)
+        return queryset.count()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a page of items after a cursor position."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            )
+        items = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            self.next_cursor = self.encode_cursor(items[-1])
+        return items
+
+    def get_next_link(self):
+        """Return a link to a next page if any."""
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        """Return a response in the page number paginator format."""
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", None),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class FollowFeedPagination(KeysetPagination):
+    """Keyset paginator merging sorted sources of recipe positions.
+
+    A paginated object is a list of (queryset, id field) sources with
+    a pub_date field, every source gives at most one page after a cursor
+    and pages are merged. A page is a list of (pub_date, id) positions,
+    a count is never made.
+    """
+    def get_source_page(self, source, position, page_size):
+        """Return (pub_date, id) positions of a source after a cursor."""
+        queryset, id_field = source
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, **{f"{id_field}__lt": pk})
+            )
+        return list(
+            queryset.order_by("-pub_date", f"-{id_field}").values_list(
+                "pub_date", id_field
+            )[:page_size]
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a page of merged positions after a cursor position."""
+        self.request = request
+        self.count = None
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        positions = []
+        for item in heapq.merge(
+            *(
+                self.get_source_page(source, position, page_size + 1)
+                for source in queryset
+            ),
+            reverse=True,
+        ):
+            if positions and positions[-1] == item:
+                continue
+            positions.append(item)
+            if len(positions) > page_size:
+                break
+        self.next_cursor = None
+        if len(positions) > page_size:
+            positions = positions[:page_size]
+            self.next_cursor = self.encode_position(*positions[-1])
+        return positions
+
+
+class RecipeFeedPagination(PageSizeInParamsPagination):
+    """Recipe feed paginator with an opt-in keyset mode.
+
+    A pagination=cursor query param or a cursor query param switches
+    from page numbers to the keyset paginator. Custom orderings and
+    searches always use page numbers, the keyset is built on the
+    publication order only.
+    """
+    mode_query_param = "pagination"
+    ordering_query_params = ("ordering", "search")
+    keyset_pagination_class = KeysetPagination
+
+    def is_keyset_mode(self, request):
+        """Return True if a request asks for the keyset paginator."""
+        if any(
+            request.query_params.get(param)
+            for param in self.ordering_query_params
+        ):
+            return False
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.keyset_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Redefinition paginate_queryset method."""
+        self.keyset_paginator = None
+        if self.is_keyset_mode(request):
+            self.keyset_paginator = self.keyset_pagination_class()
+            return self.keyset_paginator.paginate_queryset(
+                queryset, request, view=view
+            )
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        """Redefinition get_paginated_response method."""
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,260 @@
+"""API v.1 request profiling."""
+
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("api.profiling")
+
+PERCENTILES = (50, 95, 99)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view made more SQL queries than its query budget allows."""
+
+
+def get_percentile(samples, percentile):
+    """Return a nearest-rank percentile of sorted samples."""
+    if not samples:
+        return None
+    rank = max(round(percentile / 100 * len(samples)) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
+
+
+def get_query_budget(view_func, method):
+    """Return a query budget declared by a view for a request method.
+
+    ViewSets declare budgets per action in a query_budgets attribute.
+    """
+    view_class = getattr(view_func, "cls", None)
+    budgets = getattr(view_class, "query_budgets", None)
+    if not budgets:
+        return None
+    actions = getattr(view_func, "actions", None) or {}
+    return budgets.get(actions.get(method.lower()))
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their time."""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestProfile:
+    """Timings of one request."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = QueryTimer()
+        self.view_name = None
+        self.query_budget = None
+        self.view_started = None
+        self.view_db_duration = 0.0
+        self.view_finished = None
+
+    @contextmanager
+    def count_queries(self):
+        """Count queries of all database connections."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.queries))
+            yield
+
+    def start_view(self, view_name, query_budget):
+        """Mark a start of a view call."""
+        self.view_name = view_name
+        self.query_budget = query_budget
+        self.view_started = time.perf_counter()
+        self.view_db_duration = self.queries.duration
+
+    def finish_view(self):
+        """Mark an end of a view call before a response is rendered."""
+        if self.view_started is None or self.view_finished is not None:
+            return
+        self.view_finished = time.perf_counter()
+        self.view_db_duration = self.queries.duration - self.view_db_duration
+
+    def get_data(self, request, response, size=None):
+        """Return profile data of a finished request.
+
+        A size of a streaming response is counted while it is streamed.
+        """
+        self.finish_view()
+        finished = time.perf_counter()
+        serializer = None
+        render = None
+        if self.view_finished is not None:
+            serializer = max(
+                self.view_finished - self.view_started - self.view_db_duration,
+                0,
+            )
+            render = finished - self.view_finished
+        if size is None and not response.streaming:
+            size = len(response.content)
+        return {
+            "method": request.method,
+            "path": request.path,
+            "view": self.view_name,
+            "status": response.status_code,
+            "queries": self.queries.count,
+            "query_budget": self.query_budget,
+            "db_ms": self.queries.duration * 1000,
+            "serializer_ms": None if serializer is None else serializer * 1000,
+            "render_ms": None if render is None else render * 1000,
+            "total_ms": (finished - self.started) * 1000,
+            "size_bytes": size,
+        }
+
+
+def get_server_timing(data):
+    """Return a Server-Timing header value of profile data."""
+    metrics = [
+        f'db;dur={data["db_ms"]:.1f};desc="{data["queries"]} queries"'
+    ]
+    for name in ("serializer", "render"):
+        if data[f"{name}_ms"] is not None:
+            metrics.append(f"{name};dur={data[f'{name}_ms']:.1f}")
+    metrics.append(f"total;dur={data['total_ms']:.1f}")
+    return ", ".join(metrics)
+
+
+class ViewMetrics:
+    """Per-process latest samples of request profiles by views."""
+    fields = ("total_ms", "db_ms", "serializer_ms", "queries", "size_bytes")
+
+    def __init__(self, max_samples):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self.budget_exceeded = defaultdict(int)
+
+    def add(self, data):
+        """Add a request profile to samples of its view."""
+        key = f"{data['method']} {data['view']}"
+        with self.lock:
+            self.samples[key].append(data)
+            if (
+                data["query_budget"] is not None
+                and data["queries"] > data["query_budget"]
+            ):
+                self.budget_exceeded[key] += 1
+
+    def get_summary(self):
+        """Return percentiles of samples by views."""
+        with self.lock:
+            samples = {key: list(items) for key, items in self.samples.items()}
+            budget_exceeded = dict(self.budget_exceeded)
+        summary = {}
+        for key, items in sorted(samples.items()):
+            view_summary = {
+                "count": len(items),
+                "query_budget": items[-1]["query_budget"],
+                "budget_exceeded": budget_exceeded.get(key, 0),
+            }
+            for field in self.fields:
+                values = sorted(
+                    item[field] for item in items if item[field] is not None
+                )
+                view_summary[field] = {
+                    f"p{percentile}": get_percentile(values, percentile)
+                    for percentile in PERCENTILES
+                }
+            summary[key] = view_summary
+        return summary
+
+
+view_metrics = ViewMetrics(max_samples=settings.REQUEST_PROFILING_SAMPLES)
+
+
+class RequestProfilingMiddleware:
+    """Middleware profiling SQL, serializer and render time of requests.
+
+    Timings go to a JSON log record and per-view metrics, a Server-Timing
+    header is sent to staff users or with DEBUG only. A serializer time
+    is Python time of a view without SQL. Query budgets of views are
+    checked, QUERY_BUDGET_STRICT turns an exceeded budget into an error
+    for test runs. A streaming response is recorded once it is streamed,
+    with its size and queries made while streaming, its Server-Timing
+    header covers the view only.
+    """
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        request.profile = profile
+        with profile.count_queries():
+            response = self.get_response(request)
+        data = profile.get_data(request, response)
+        if self.show_server_timing(request):
+            response["Server-Timing"] = get_server_timing(data)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, response.streaming_content
+            )
+        else:
+            self.record(data)
+        return response
+
+    def show_server_timing(self, request):
+        """Return whether a client may see timings of its request."""
+        user = getattr(request, "user", None)
+        return settings.DEBUG or bool(user and user.is_staff)
+
+    def stream(self, request, response, content):
+        """Stream a response content and record it once it is streamed."""
+        size = 0
+        with request.profile.count_queries():
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        self.record(request.profile.get_data(request, response, size))
+
+    def record(self, data):
+        """Log profile data, add it to view metrics, check a budget."""
+        logger.info(json.dumps(data))
+        if data["view"] is not None:
+            view_metrics.add(data)
+        self.check_query_budget(data)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Mark a start of a view call."""
+        request.profile.start_view(
+            request.resolver_match.view_name,
+            get_query_budget(view_func, request.method),
+        )
+
+    def process_template_response(self, request, response):
+        """Mark an end of a view call before a response is rendered."""
+        request.profile.finish_view()
+        return response
+
+    def check_query_budget(self, data):
+        """Report a request exceeding a query budget of its view."""
+        budget = data["query_budget"]
+        if budget is None or data["queries"] <= budget:
+            return
+        message = (
+            f"{data['method']} {data['view']} made {data['queries']} "
+            f"queries with a budget of {budget}."
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,162 @@
+"""API v.1 ingredient and recipe search."""
+
+
+import bisect
+import time
+from collections import defaultdict
+from itertools import chain, islice
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+
+from api.v1.cache import get_catalog_version
+from recipe.models import Ingredient, Recipe
+
+TRIGRAM_SIZE = 3
+PREFIX_UPPER_BOUND = "\uffff"
+
+
+def get_trigrams(value):
+    """Return a set of trigrams of a string."""
+    return {
+        value[i:i + TRIGRAM_SIZE]
+        for i in range(len(value) - TRIGRAM_SIZE + 1)
+    }
+
+
+def rank_ingredients_by_name(queryset, value):
+    """Filter ingredients by a name part, prefix matches go first.
+
+    Names are matched by a prefix only for values shorter than a trigram.
+    Lower(name) expressions are served by the lower(name) indexes
+    on PostgreSQL and work as plain scans on SQLite.
+    """
+    value = value.lower()
+    if len(value) < TRIGRAM_SIZE:
+        name_lookup = {"name_lower__startswith": value}
+    else:
+        name_lookup = {"name_lower__contains": value}
+    return (
+        queryset.annotate(name_lower=Lower("name"))
+        .filter(**name_lookup)
+        .annotate(
+            name_rank=Case(
+                When(name_lower__startswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("name_rank", "name_lower", "id")
+    )
+
+
+def search_recipes(queryset, value):
+    """Filter recipes by words of a name, a text and ingredient names.
+
+    PostgreSQL matches a search vector served by a GIN index and ranks
+    results, other DBs fall back to substring lookups with name matches
+    going first.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        query = SearchQuery(value, config=settings.SEARCH_CONFIG)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "-pub_date", "-id")
+        )
+    matches = Recipe.objects.filter(
+        Q(name__icontains=value)
+        | Q(text__icontains=value)
+        | Q(ingredients__name__icontains=value)
+    )
+    return (
+        queryset.filter(pk__in=matches.values("pk"))
+        .annotate(
+            search_rank=Case(
+                When(name__icontains=value, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("-search_rank", "-pub_date", "-id")
+    )
+
+
+class IngredientSearchIndex:
+    """In-process index of an ingredient catalog for autocomplete.
+
+    Lowercased names are kept sorted for prefix lookups with a binary
+    search, a trigram map narrows down substring lookups. The index is
+    reloaded when the catalog version changes or a timeout expires.
+    """
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.loaded_at = None
+        self.loaded_version = None
+        self.snapshot = ([], [], {})
+
+    def load(self, version):
+        """Load the catalog and rebuild the index."""
+        items = sorted(
+            Ingredient.objects.values("id", "name", "measurement_unit"),
+            key=lambda item: (item["name"].lower(), item["id"]),
+        )
+        keys = [item["name"].lower() for item in items]
+        trigrams = defaultdict(list)
+        for position, key in enumerate(keys):
+            for trigram in get_trigrams(key):
+                trigrams[trigram].append(position)
+        self.snapshot = (keys, items, dict(trigrams))
+        self.loaded_at = time.monotonic()
+        self.loaded_version = version
+
+    def ensure_loaded(self):
+        """Reload the catalog if it is changed or expired."""
+        version = get_catalog_version(Ingredient)
+        if (
+            self.loaded_at is None
+            or self.loaded_version != version
+            or time.monotonic() - self.loaded_at > self.timeout
+        ):
+            self.load(version)
+
+    def search(self, value, limit):
+        """Return at most limit ingredients with a name part.
+
+        Prefix matches go first. Values shorter than a trigram match
+        prefixes only.
+        """
+        self.ensure_loaded()
+        keys, items, trigrams = self.snapshot
+        value = value.lower()
+        prefix_positions = range(
+            bisect.bisect_left(keys, value),
+            bisect.bisect_left(keys, value + PREFIX_UPPER_BOUND),
+        )
+        value_trigrams = get_trigrams(value)
+        if value_trigrams:
+            candidates = min(
+                (trigrams.get(trigram, []) for trigram in value_trigrams),
+                key=len,
+            )
+        else:
+            candidates = ()
+        substring_positions = (
+            position
+            for position in candidates
+            if value in keys[position] and position not in prefix_positions
+        )
+        return [
+            items[position]
+            for position in islice(
+                chain(prefix_positions, substring_positions), limit
+            )
+        ]
+
+
+ingredient_search_index = IngredientSearchIndex(
+    timeout=settings.INGREDIENT_SEARCH_INDEX_TIMEOUT
+)
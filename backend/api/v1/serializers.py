@@ -1,27 +1,37 @@
 """API v.1 serializers."""
 
 
+from functools import partial
+
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, validators
 
-from api.v1.validators import (object_exists_validate,
-                               positive_integer_in_field_validate,
+from api.v1.fields import ImageVariantsField, StreamingBase64ImageField
+from api.v1.matching import recipe_match_index
+from api.v1.validators import (positive_integer_in_field_validate,
+                               positive_integer_in_query_params_validate,
                                unique_in_query_params_validate)
+from recipe.images import schedule_variants
 from recipe.models import (Ingredient, IngredientPortion, IsFavorited,
-                           IsInShoppingCart, Recipe, Tag)
+                           IsInShoppingCart, Recipe, ShoppingCartIngredient,
+                           Tag)
 from users.models import Follow
 
 User = get_user_model()
 
+RECIPES_BATCH_MAX_SIZE = 100
+
 
 class FollowingRecipesSerializer(serializers.ModelSerializer):
     """Recipe.Recipe model serializer for an usage in FollowSerializer."""
+    image_variants = ImageVariantsField(source="*")
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -57,53 +67,37 @@ class FollowSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Method gets data for an is_subscribed field."""
-        is_subscribed = False
-        username = self.context["request"].user.username
-        author = obj.author
-        user_me = get_object_or_404(User, username=username)
-        if Follow.objects.filter(author=author, follower=user_me).exists():
-            is_subscribed = True
-        return is_subscribed
+        user_me = self.context["request"].user
+        if obj.follower_id == user_me.id:
+            return True
+        return Follow.objects.filter(
+            author=obj.author, follower=user_me
+        ).exists()
 
     def get_recipes(self, obj):
-        """Method gets data for a recipes field."""
-        query_params = self.context["request"].query_params
+        """Method gets data for a recipes field.
+
+        Uses recipes prefetched to a limited_recipes attribute if any.
+        """
         author = obj.author
-        if query_params.get("recipes_limit"):
-            recipes_limit = int(query_params.get("recipes_limit"))
-            return FollowingRecipesSerializer(
-                Recipe.objects.filter(author=author).all()[:recipes_limit],
-                many=True,
-            ).data
+        if hasattr(author, "limited_recipes"):
+            recipes = author.limited_recipes
         else:
-            return FollowingRecipesSerializer(
-                Recipe.objects.filter(author=author).all(), many=True
-            ).data
+            recipes_limit = positive_integer_in_query_params_validate(
+                query_params=self.context["request"].query_params,
+                param_name="recipes_limit",
+            )
+            recipes = Recipe.objects.filter(author=author)[:recipes_limit]
+        return FollowingRecipesSerializer(recipes, many=True).data
 
     def get_recipe_count(self, obj):
         """Method gets data for a recipe_count field."""
-        author = obj.author
-        return Recipe.objects.filter(author=author).count()
+        return obj.author.recipes_count
 
     def get_id(self, obj):
         """Method gets data for an id field."""
         return obj.author.id
 
-    def validate(self, data):
-        """Validate user is not equal an author.
-
-        Validate user does not already follow this author.
-        """
-        user_me = self.context["request"].user
-        author = data["author"]
-        if user_me == author:
-            raise validators.ValidationError("You can not follow yourself.")
-        if Follow.objects.filter(follower=user_me, author=author).exists():
-            raise validators.ValidationError(
-                "You are already follow this author."
-            )
-        return data
-
     class Meta:
         model = Follow
         fields = (
@@ -125,9 +119,17 @@ class CustomGetUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
-        """Method gets data for an is_subscribed field."""
+        """Method gets data for an is_subscribed field.
+
+        Uses an is_subscribed annotation when a queryset provides it.
+        A user can not follow themselves, so no query is made for them.
+        """
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         is_subscribed = False
         follower = self.context["request"].user.id
+        if obj.id == follower:
+            return is_subscribed
         if Follow.objects.filter(author=obj, follower=follower).exists():
             is_subscribed = True
         return is_subscribed
@@ -172,19 +174,21 @@ class PasswordUpdateSerializer(UserCreateSerializer):
 
     def validate(self, data):
         """Validate a correctness of a current password from a request."""
-        username = self.context["request"].user.username
-        user_me = get_object_or_404(User, username=username)
+        user_me = User.objects.get(pk=self.context["request"].user.pk)
         current_password = data["current_password"]
         if not user_me.check_password(current_password):
             raise validators.ValidationError(
                 "Current password is not correct!"
             )
-        return data
+        return {**data, "user": user_me}
 
     def create(self, validated_data):
-        """Redefinition of a create method."""
-        username = self.context["request"].user.username
-        user_me = get_object_or_404(User, username=username)
+        """Redefinition of a create method.
+
+        A password is changed on a user loaded by validation, a request
+        user may come from the token cache.
+        """
+        user_me = validated_data["user"]
         new_password = validated_data.pop("new_password")
         user_me.set_password(new_password)
         user_me.save()
@@ -218,6 +222,7 @@ class IsAddedSerializer(serializers.ModelSerializer):
         write_only=True, queryset=Recipe.objects.all()
     )
     image = serializers.ImageField(read_only=True, source="recipe.image")
+    image_variants = ImageVariantsField(source="recipe")
     name = serializers.StringRelatedField(
         read_only=True, source="recipe.name"
     )
@@ -228,39 +233,102 @@ class IsAddedSerializer(serializers.ModelSerializer):
 
 class IsFavoritedSerializer(IsAddedSerializer):
     """Recipe.IsFavorited model serializer."""
-    def validate(self, data):
-        """Validate IsFavorited object exists."""
-        return object_exists_validate(
-            data=data,
-            context=self.context,
-            model=IsFavorited,
-            location="favorites",
-        )
-
     class Meta:
         model = IsFavorited
-        fields = ("id", "image", "name", "cooking_time", "user", "recipe")
+        fields = (
+            "id",
+            "image",
+            "image_variants",
+            "name",
+            "cooking_time",
+            "user",
+            "recipe",
+        )
 
 
 class IsInShoppingCartSerializer(IsAddedSerializer):
     """Recipe.IsInShoppingCart serializer."""
-    def validate(self, data):
-        """Validate IsInShoppingCart object exists."""
-        return object_exists_validate(
-            data=data,
-            context=self.context,
-            model=IsInShoppingCart,
-            location="cart",
-        )
-
     class Meta:
         model = IsInShoppingCart
-        fields = ("id", "image", "name", "cooking_time", "user", "recipe")
+        fields = (
+            "id",
+            "image",
+            "image_variants",
+            "name",
+            "cooking_time",
+            "servings",
+            "user",
+            "recipe",
+        )
+
+
+class ShoppingCartServingsSerializer(IsInShoppingCartSerializer):
+    """Recipe.IsInShoppingCart serializer changing servings only.
+
+    A customer and a recipe of a cart item can not be changed.
+    """
+    def validate(self, attrs):
+        """Validate only servings are given."""
+        unknown_fields = set(self.initial_data) - {"servings"}
+        if unknown_fields:
+            raise serializers.ValidationError(
+                {
+                    field: ["Only servings of a cart item can be changed."]
+                    for field in sorted(unknown_fields)
+                }
+            )
+        return attrs
+
+    class Meta(IsInShoppingCartSerializer.Meta):
+        fields = (
+            "id",
+            "image",
+            "image_variants",
+            "name",
+            "cooking_time",
+            "servings",
+        )
+
+
+class RecipesBatchSerializer(serializers.Serializer):
+    """Serializer of a list of recipe ids for batch actions."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPES_BATCH_MAX_SIZE,
+    )
+
+
+class InBulkPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Primary key field looking up objects loaded in bulk first.
+
+    Objects are loaded by RecipeCreateSerializer into a context under
+    a bulk_context_key.
+    """
+    bulk_context_key = None
+
+    def to_internal_value(self, data):
+        """Redefinition to_internal_value method."""
+        if str(data).isdigit():
+            obj = self.context.get(self.bulk_context_key, {}).get(int(data))
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
+
+
+class IngredientPrimaryKeyField(InBulkPrimaryKeyField):
+    """Ingredient primary key field."""
+    bulk_context_key = "ingredients_in_bulk"
+
+
+class TagPrimaryKeyField(InBulkPrimaryKeyField):
+    """Tag primary key field."""
+    bulk_context_key = "tags_in_bulk"
 
 
 class IngredientPortionSerializer(serializers.ModelSerializer):
     """Recipe.IngredientPortion model serializer."""
-    id = serializers.PrimaryKeyRelatedField(
+    id = IngredientPrimaryKeyField(
         source="ingredient", queryset=Ingredient.objects.all()
     )
     name = serializers.StringRelatedField(source="ingredient.name")
@@ -279,41 +347,151 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = IngredientPortionSerializer(
         many=True, source="ingredients_in_portion"
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
-    image = Base64ImageField(
+    tags = TagPrimaryKeyField(many=True, queryset=Tag.objects.all())
+    image = StreamingBase64ImageField(
         max_length=None,
         use_url=True,
     )
 
     def put_data_in_fields(self, current_object, tags_data, ingredients_data):
         """Definition for put_data_in_fields method."""
-        for tag in tags_data:
-            current_object.tags.add(tag)
-        for ingredient in ingredients_data:
-            IngredientPortion.objects.create(
+        current_object.tags.set(tags_data)
+        IngredientPortion.objects.bulk_create(
+            IngredientPortion(
                 ingredient=ingredient["ingredient"],
                 recipe=current_object,
                 amount=ingredient["amount"],
             )
+            for ingredient in ingredients_data
+        )
+
+    def update_match_index(self, recipe, ingredients_data):
+        """Update recipe ingredients in the match index after a commit."""
+        transaction.on_commit(
+            partial(
+                recipe_match_index.update_recipes,
+                {
+                    recipe.id: [
+                        ingredient["ingredient"].id
+                        for ingredient in ingredients_data
+                    ]
+                },
+            )
+        )
+
+    def update_portions(self, instance, ingredients_data):
+        """Apply a difference between current and new portions.
+
+        Returns ids of ingredients which are added, changed or deleted,
+        shopping cart totals of them are refreshed by a caller at once.
+        """
+        current_portions = {
+            portion.ingredient_id: portion
+            for portion in IngredientPortion.objects.filter(recipe=instance)
+        }
+        new_amounts = {
+            ingredient["ingredient"].id: ingredient["amount"]
+            for ingredient in ingredients_data
+        }
+        deleted_ids = current_portions.keys() - new_amounts.keys()
+        added_ids = new_amounts.keys() - current_portions.keys()
+        changed_portions = []
+        for ingredient_id, portion in current_portions.items():
+            amount = new_amounts.get(ingredient_id)
+            if amount is not None and amount != portion.amount:
+                portion.amount = amount
+                changed_portions.append(portion)
+        if deleted_ids:
+            IngredientPortion.objects.filter(
+                recipe=instance, ingredient__in=deleted_ids
+            ).delete(refresh_totals=False)
+        if changed_portions:
+            IngredientPortion.objects.bulk_update(changed_portions, ["amount"])
+        if added_ids:
+            IngredientPortion.objects.bulk_create(
+                IngredientPortion(
+                    ingredient_id=ingredient_id,
+                    recipe=instance,
+                    amount=new_amounts[ingredient_id],
+                )
+                for ingredient_id in added_ids
+            )
+        return (
+            deleted_ids
+            | added_ids
+            | {portion.ingredient_id for portion in changed_portions}
+        )
+
+    def to_internal_value(self, data):
+        """Redefinition to_internal_value method.
+
+        Loads all the ingredients and all the tags of a request with one
+        query each.
+        """
+        tags = data.get("tags")
+        if isinstance(tags, list):
+            self.context["tags_in_bulk"] = Tag.objects.in_bulk(
+                {int(tag) for tag in tags if str(tag).isdigit()}
+            )
+        ingredients = data.get("ingredients")
+        if isinstance(ingredients, list):
+            ingredients_ids = {
+                int(ingredient["id"])
+                for ingredient in ingredients
+                if isinstance(ingredient, dict)
+                and str(ingredient.get("id")).isdigit()
+            }
+            self.context["ingredients_in_bulk"] = Ingredient.objects.in_bulk(
+                ingredients_ids
+            )
+        return super().to_internal_value(data)
+
+    def to_representation(self, instance):
+        """Redefinition to_representation method.
+
+        Loads ingredients of portions with one query.
+        """
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                "ingredients_in_portion",
+                queryset=IngredientPortion.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
+        return super().to_representation(instance)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Redefinition create method."""
         tags_data = validated_data.pop("tags")
         ingredients_data = validated_data.pop("ingredients_in_portion")
         recipe = Recipe.objects.create(**validated_data)
         self.put_data_in_fields(recipe, tags_data, ingredients_data)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vectors()
+        self.update_match_index(recipe, ingredients_data)
+        schedule_variants(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Redefinition update method."""
         tags_data = validated_data.pop("tags")
         ingredients_data = validated_data.pop("ingredients_in_portion")
-        instance.tags.clear()
-        IngredientPortion.objects.filter(recipe=instance).delete()
+        if "image" in validated_data:
+            validated_data["image_variants_ready"] = False
+            schedule_variants(instance)
         super().update(instance, validated_data)
-        self.put_data_in_fields(instance, tags_data, ingredients_data)
+        instance.tags.set(tags_data)
+        changed_ingredients = self.update_portions(instance, ingredients_data)
+        if changed_ingredients:
+            ShoppingCartIngredient.objects.refresh_for_recipe(
+                recipe=instance, ingredients=list(changed_ingredients)
+            )
+        Recipe.objects.filter(pk=instance.pk).update_search_vectors()
+        if changed_ingredients:
+            self.update_match_index(instance, ingredients_data)
         return instance
 
     def validate_tags(self, value):
@@ -368,9 +546,15 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     tags = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField(source="*")
 
-    def get_object_exists(self, model, obj):
-        """Definition get_object_exists method."""
+    def get_object_exists(self, model, obj, field_name):
+        """Definition get_object_exists method.
+
+        Uses a field_name annotation when a queryset provides it.
+        """
+        if hasattr(obj, field_name):
+            return getattr(obj, field_name)
         object_exists = False
         user_me = self.context["request"].user
         if model.objects.filter(recipe=obj, user=user_me.id).exists():
@@ -379,32 +563,30 @@ class RecipeGetSerializer(serializers.ModelSerializer):
 
     def get_author(self, obj):
         """Method gets data for an author field."""
-        username = obj.author.username
-        context = self.context
-        return CustomGetUserSerializer(
-            get_object_or_404(User, username=username),
-            context=context,
-        ).data
+        author = obj.author
+        if hasattr(obj, "is_subscribed"):
+            author.is_subscribed = obj.is_subscribed
+        return CustomGetUserSerializer(author, context=self.context).data
 
     def get_ingredients(self, obj):
         """Method gets data for an ingredients field."""
         return IngredientPortionSerializer(
-            IngredientPortion.objects.filter(recipe=obj).all(), many=True
+            obj.ingredients_in_portion.all(), many=True
         ).data
 
     def get_tags(self, obj):
         """Method gets data for a tags field."""
-        return TagSerializer(
-            Tag.objects.filter(recipe=obj).all(), many=True
-        ).data
+        return TagSerializer(obj.tags.all(), many=True).data
 
     def get_is_favorited(self, obj):
         """Method gets data for an is_favorited field."""
-        return self.get_object_exists(IsFavorited, obj)
+        return self.get_object_exists(IsFavorited, obj, "is_favorited")
 
     def get_is_in_shopping_cart(self, obj):
         """Method gets data for an is_in_shopping_cart field."""
-        return self.get_object_exists(IsInShoppingCart, obj)
+        return self.get_object_exists(
+            IsInShoppingCart, obj, "is_in_shopping_cart"
+        )
 
     class Meta:
         model = Recipe
@@ -417,6 +599,27 @@ class RecipeGetSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
+
+
+class RecipeMatchSerializer(RecipeGetSerializer):
+    """Recipe.Recipe serializer with a coverage of given ingredients."""
+    missing_count = serializers.SerializerMethodField()
+    matched_count = serializers.SerializerMethodField()
+
+    def get_missing_count(self, obj):
+        """Method gets data for a missing_count field."""
+        return self.context["recipe_matches"][obj.id][0]
+
+    def get_matched_count(self, obj):
+        """Method gets data for a matched_count field."""
+        return self.context["recipe_matches"][obj.id][1]
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + (
+            "missing_count",
+            "matched_count",
+        )
@@ -4,8 +4,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.v1.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                          TagViewSet)
+from api.v1.views import (CustomUserViewSet, IngredientViewSet, MetricsView,
+                          RecipeViewSet, TagViewSet)
 
 router_v1 = DefaultRouter(trailing_slash="optional")
 router_v1.register("users", CustomUserViewSet, basename="users")
@@ -15,5 +15,6 @@ router_v1.register("ingredients", IngredientViewSet, basename="ingredients")
 
 urlpatterns = [
     path("auth/", include("djoser.urls.authtoken")),
+    path("_metrics/", MetricsView.as_view(), name="metrics"),
     path("", include(router_v1.urls)),
 ]
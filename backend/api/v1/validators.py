@@ -27,12 +27,43 @@ def unique_in_query_params_validate(items, field_name, value):
     return value
 
 
-def object_exists_validate(data, context, model, location):
-    """Validate object exists."""
-    if model.objects.filter(
-        user=context["request"].user, recipe=data["recipe"]
-    ).exists():
+def positive_integer_in_query_params_validate(query_params, param_name):
+    """Validate a query param is a positive integer if it is given."""
+    value = query_params.get(param_name)
+    if value is None:
+        return None
+    if not value.isdigit() or int(value) < 1:
         raise validators.ValidationError(
-            f"You have already added this recipe in your {location}."
+            f"{param_name} must be positive integer."
         )
-    return data
+    return int(value)
+
+
+def non_negative_integer_in_query_params_validate(query_params, param_name):
+    """Validate a query param is a non-negative integer if it is given."""
+    value = query_params.get(param_name)
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise validators.ValidationError(
+            f"{param_name} must be non-negative integer."
+        )
+    return int(value)
+
+
+def ids_in_query_params_validate(query_params, param_name):
+    """Validate a query param is a non-empty list of ids.
+
+    Ids may be given as repeated params or separated by commas.
+    """
+    values = [
+        value
+        for param in query_params.getlist(param_name)
+        for value in param.split(",")
+        if value
+    ]
+    if not values:
+        raise validators.ValidationError(f"{param_name} are required.")
+    if not all(value.isdigit() for value in values):
+        raise validators.ValidationError(f"{param_name} must be integers.")
+    return {int(value) for value in values}
@@ -1,46 +1,104 @@
 """API v.1 views."""
 
 
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Subquery, Sum, Value)
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import SAFE_METHODS, AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from api.v1.cache import get_catalog_version
+from api.v1.exporters import SHOPPING_CART_EXPORTERS
 from api.v1.filters import IngredientFilter, RecipeFilter
-from api.v1.mixins import CreateListRetrieveViewSet
-from api.v1.paginators import PageSizeInParamsPagination
+from api.v1.matching import recipe_match_index
+from api.v1.mixins import (CachedCatalogMixin, ConditionalGetMixin,
+                           CreateListRetrieveViewSet, ReplicaReadMixin)
+from api.v1.paginators import (FollowFeedPagination,
+                               PageSizeInParamsPagination,
+                               RecipeFeedPagination)
 from api.v1.permissions import (CustomIsAuthenticated, IsAdmin, IsOwner,
                                 IsSafeMethod, IsSuperUser)
+from api.v1.profiling import view_metrics
+from api.v1.search import ingredient_search_index
 from api.v1.serializers import (CustomCreateUserSerializer,
                                 CustomGetUserSerializer, FollowSerializer,
                                 IngredientSerializer, IsFavoritedSerializer,
                                 IsInShoppingCartSerializer,
                                 PasswordUpdateSerializer,
                                 RecipeCreateSerializer, RecipeGetSerializer,
-                                TagSerializer)
+                                RecipeMatchSerializer, RecipesBatchSerializer,
+                                ShoppingCartServingsSerializer, TagSerializer)
+from api.v1.validators import (ids_in_query_params_validate,
+                               non_negative_integer_in_query_params_validate,
+                               positive_integer_in_query_params_validate)
 from recipe.models import (Ingredient, IngredientPortion, IsFavorited,
-                           IsInShoppingCart, Recipe, Tag)
+                           IsInShoppingCart, Recipe, ShoppingCartIngredient,
+                           Tag, TimelineEntry)
+from recipe.units import get_base_unit, get_unit_factor
 from users.models import Follow
 
 User = get_user_model()
 
+SHOPPING_CART_CHUNK_SIZE = 2000
+RECIPE_MATCH_RESULTS_LIMIT = 100
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    ReplicaReadMixin, CachedCatalogMixin, viewsets.ReadOnlyModelViewSet
+):
     """Recipe.Tag model ViewSet."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsSafeMethod]
+    query_budgets = {"list": 3, "retrieve": 3}
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     """Recipe.Recipe model ViewSet."""
     queryset = Recipe.objects.all()
-    pagination_class = PageSizeInParamsPagination
+    etag_fields = (
+        "id",
+        "updated_at",
+        "image_variants_ready",
+        "is_favorited",
+        "is_in_shopping_cart",
+        "is_subscribed",
+        "author.username",
+        "author.email",
+        "author.first_name",
+        "author.last_name",
+    )
+    pagination_class = RecipeFeedPagination
+    primary_actions = ("favorite", "shopping_cart")
+    query_budgets = {
+        "list": 12,
+        "retrieve": 8,
+        "create": 16,
+        "update": 20,
+        "partial_update": 20,
+        "destroy": 17,
+        "favorite": 8,
+        "favorite_batch": 8,
+        "shopping_cart": 14,
+        "shopping_cart_batch": 12,
+        "download_shopping_cart": 3,
+        "what_can_i_cook": 10,
+        "feed": 8,
+    }
     permission_classes = [
         CustomIsAuthenticated & (IsAdmin | IsSuperUser | IsOwner)
         | IsSafeMethod
@@ -48,6 +106,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """Redefinition get_queryset method."""
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.with_related().with_user_flags(
+                self.request.user
+            )
+        return queryset
+
+    def get_etag_version(self):
+        """Redefinition get_etag_version method.
+
+        Tag and ingredient names are a part of a recipe payload.
+        """
+        return (get_catalog_version(Tag), get_catalog_version(Ingredient))
+
     def get_serializer_class(self):
         """Redefinition get_serializer_class method."""
         if self.request.method in SAFE_METHODS:
@@ -62,26 +136,89 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Redefinition perform_update method."""
         serializer.save(author=self.request.user, partial=False)
 
-    def add(self, request, model, serializer_class, location, **kwargs):
-        """A method for adding data in objects or deleting them."""
+    def perform_destroy(self, instance):
+        """Redefinition perform_destroy method.
+
+        A recipe deletion refreshes shopping cart totals of its customers.
+        """
+        with transaction.atomic():
+            transaction.on_commit(
+                partial(recipe_match_index.remove_recipes, [instance.id])
+            )
+            instance.delete()
+
+    def add(
+        self, request, model, serializer_class, location, values=None, **kwargs
+    ):
+        """A method for adding data in objects or deleting them.
+
+        Unique pairs are inserted or deleted at once, an existence of a
+        recipe is checked only if nothing is changed. Optional values are
+        set to other fields of an added object.
+        """
         user_me = request.user
-        recipe = get_object_or_404(Recipe, id=kwargs["recipes_id"])
+        recipes_id = int(kwargs["recipes_id"])
         if request.method == "GET":
-            data = {"user": user_me.id, "recipe": recipe.id}
+            recipe = get_object_or_404(Recipe, id=recipes_id)
+            added = model.objects.add_pairs(user_me.id, [recipe.id], values)
+            if recipe.id not in added:
+                raise ValidationError(
+                    {
+                        api_settings.NON_FIELD_ERRORS_KEY: [
+                            f"You have already added this recipe "
+                            f"in your {location}."
+                        ]
+                    }
+                )
+            instance = model(
+                id=added[recipe.id],
+                user=user_me,
+                recipe=recipe,
+                **(values or {}),
+            )
             context = {"request": request}
-            serializer = serializer_class(data=data, context=context)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            serializer = serializer_class(instance, context=context)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         if request.method == "DELETE":
-            if not model.objects.filter(user=user_me, recipe=recipe).exists():
+            if not model.objects.remove_pairs(user_me.id, [recipes_id]):
+                get_object_or_404(Recipe, id=recipes_id)
                 return Response(
                     {"detail": f"There is no this recipe in {location}."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            model.objects.filter(user=user_me, recipe=recipe).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def batch(self, request, model):
+        """A method for adding many recipes in objects or deleting them.
+
+        Returns a status of every recipe and ids of changed recipes.
+        """
+        serializer = RecipesBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        found = set(
+            Recipe.objects.filter(id__in=recipes_ids).values_list(
+                "id", flat=True
+            )
+        )
+        user_me = request.user
+        if request.method == "POST":
+            changed = set(model.objects.add_pairs(user_me.id, found))
+            changed_status, unchanged_status = "added", "exists"
+        else:
+            changed = model.objects.remove_pairs(user_me.id, found)
+            changed_status, unchanged_status = "removed", "absent"
+        results = []
+        for recipes_id in recipes_ids:
+            if recipes_id not in found:
+                recipe_status = "not_found"
+            elif recipes_id in changed:
+                recipe_status = changed_status
+            else:
+                recipe_status = unchanged_status
+            results.append({"id": recipes_id, "status": recipe_status})
+        return results, changed
+
     @action(
         detail=False,
         methods=["get", "delete"],
@@ -102,19 +239,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        methods=["get", "delete"],
+        methods=["post", "delete"],
+        url_path="favorite/batch",
+        url_name="favorite_batch",
+        permission_classes=[CustomIsAuthenticated],
+    )
+    def favorite_batch(self, request):
+        """An action for adding or deleting many IsFavorited objects."""
+        results, _ = self.batch(request=request, model=IsFavorited)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get", "patch", "delete"],
         url_path=r"(?P<recipes_id>\d+)/shopping_cart",
         url_name="shopping_cart",
         permission_classes=[CustomIsAuthenticated],
     )
     def shopping_cart(self, request, **kwargs):
-        """An action for adding or deleting IsInShoppingCart objects."""
-        return self.add(
-            request=request,
-            model=IsInShoppingCart,
-            serializer_class=IsInShoppingCartSerializer,
-            location="cart",
-            **kwargs,
+        """An action for adding, changing or deleting IsInShoppingCart objects.
+
+        A servings query param sets a servings multiplier of an added
+        recipe, a PATCH request changes it. Refreshes shopping cart totals
+        of a current user after a change, a changed cart item refreshes
+        them on save.
+        """
+        if request.method == "PATCH":
+            instance = get_object_or_404(
+                IsInShoppingCart.objects.select_related("recipe"),
+                user=request.user,
+                recipe=kwargs["recipes_id"],
+            )
+            serializer = ShoppingCartServingsSerializer(
+                instance,
+                data=request.data,
+                partial=True,
+                context={"request": request},
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            response = Response(serializer.data, status=status.HTTP_200_OK)
+        else:
+            servings = positive_integer_in_query_params_validate(
+                query_params=request.query_params, param_name="servings"
+            )
+            response = self.add(
+                request=request,
+                model=IsInShoppingCart,
+                serializer_class=IsInShoppingCartSerializer,
+                location="cart",
+                values={"servings": servings or 1},
+                **kwargs,
+            )
+        if response.status_code in (
+            status.HTTP_201_CREATED,
+            status.HTTP_204_NO_CONTENT,
+        ):
+            ShoppingCartIngredient.objects.refresh_for_recipe(
+                recipe=kwargs["recipes_id"], users=[request.user.id]
+            )
+        return response
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart/batch",
+        url_name="shopping_cart_batch",
+        permission_classes=[CustomIsAuthenticated],
+    )
+    def shopping_cart_batch(self, request):
+        """An action for adding or deleting many IsInShoppingCart objects.
+
+        Refreshes shopping cart totals of a current user after a change.
+        """
+        results, changed = self.batch(request=request, model=IsInShoppingCart)
+        if changed:
+            ingredients = IngredientPortion.objects.filter(
+                recipe__in=changed
+            ).values_list("ingredient", flat=True)
+            ShoppingCartIngredient.objects.refresh(
+                [request.user.id], list(ingredients.distinct())
+            )
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    def get_shopping_cart_queryset(self):
+        """Return summed ingredients of a current user shopping cart."""
+        return (
+            ShoppingCartIngredient.objects.filter(user=self.request.user)
+            .values(
+                name=F("ingredient__name"),
+                measurement_unit=get_base_unit("ingredient__measurement_unit"),
+            )
+            .annotate(
+                total_amount=Sum(
+                    F("total_amount")
+                    * get_unit_factor("ingredient__measurement_unit")
+                )
+            )
+            .order_by("name", "measurement_unit")
         )
 
     @action(
@@ -125,47 +347,189 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[CustomIsAuthenticated],
     )
     def download_shopping_cart(self, request):
-        """An action for downloading a shopping cart as a .txt file."""
-        user_me = request.user
-        shopping_cart = "Мой список покупок: \n"
-        shopping_queryset = (
-            IngredientPortion.objects.filter(recipe__customers__user=user_me)
-            .values(
-                "ingredient__name",
-                "ingredient__measurement_unit",
+        """An action for downloading a shopping cart as a file.
+
+        A file format is chosen by a file_format query param. Amounts of
+        an ingredient in compatible units are converted to a base unit
+        and summed in one query.
+        """
+        file_format = request.query_params.get("file_format", "txt")
+        if file_format not in SHOPPING_CART_EXPORTERS:
+            return Response(
+                {
+                    "detail": (
+                        f"File format must be one of: "
+                        f"{', '.join(SHOPPING_CART_EXPORTERS)}."
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .annotate(amount=Sum("amount"))
-            .order_by("ingredient__name")
+        content_type, exporter = SHOPPING_CART_EXPORTERS[file_format]
+        response = StreamingHttpResponse(
+            exporter(
+                self.get_shopping_cart_queryset().iterator(
+                    chunk_size=SHOPPING_CART_CHUNK_SIZE
+                )
+            ),
+            content_type=content_type,
         )
-        for ingredient_item in shopping_queryset:
-            shopping_cart += (
-                f"{ingredient_item['ingredient__name']} "
-                f"- {ingredient_item['amount']} "
-                f"({ingredient_item['ingredient__measurement_unit']})\n"
-            )
-        response = HttpResponse(
-            shopping_cart, "Content-Type: application/txt"
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_cart.{file_format}"'
         )
-        response[
-            "Content-Disposition"
-        ] = "attachment; filename='Shopping cart'"
         return response
 
+    def get_feed_sources(self):
+        """Return (queryset, id field) sources of a current user feed."""
+        user_me = self.request.user
+        return [
+            (TimelineEntry.objects.filter(user=user_me), "recipe"),
+            (
+                Recipe.objects.filter(
+                    fanned_out=False, author__followers__follower=user_me
+                ),
+                "id",
+            ),
+        ]
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="feed",
+        url_name="feed",
+        pagination_class=FollowFeedPagination,
+        permission_classes=[CustomIsAuthenticated],
+    )
+    def feed(self, request):
+        """An action for getting recipes of all the followed authors.
+
+        Recipes come from a timeline filled on write, recipes posted while
+        their authors had too many followers to fan out are merged on read.
+        """
+        positions = self.paginate_queryset(self.get_feed_sources())
+        recipes = self.get_queryset().in_bulk([pk for _, pk in positions])
+        serializer = self.get_serializer(
+            [recipes[pk] for _, pk in positions if pk in recipes], many=True
+        )
+        return self.get_paginated_response(serializer.data)
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="what_can_i_cook",
+        url_name="what_can_i_cook",
+        pagination_class=PageSizeInParamsPagination,
+    )
+    def what_can_i_cook(self, request):
+        """An action for getting recipes ranked by available ingredients.
+
+        Recipes are matched by the in-process ingredient index, only
+        a page of them is loaded from DB.
+        """
+        ingredients_ids = ids_in_query_params_validate(
+            query_params=request.query_params, param_name="ingredients"
+        )
+        max_missing = non_negative_integer_in_query_params_validate(
+            query_params=request.query_params, param_name="max_missing"
+        )
+        matches = recipe_match_index.match(ingredients_ids, max_missing)
+        page = self.paginate_queryset(matches)
+        paginated = page is not None
+        if not paginated:
+            page = matches[:RECIPE_MATCH_RESULTS_LIMIT]
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        deleted_ids = [
+            recipe_id for recipe_id, _, _ in page if recipe_id not in recipes
+        ]
+        if deleted_ids:
+            recipe_match_index.remove_recipes(deleted_ids)
+        context = self.get_serializer_context()
+        context["recipe_matches"] = {
+            recipe_id: (missing_count, matched_count)
+            for recipe_id, missing_count, matched_count in page
+        }
+        serializer = RecipeMatchSerializer(
+            [
+                recipes[recipe_id]
+                for recipe_id, _, _ in page
+                if recipe_id in recipes
+            ],
+            many=True,
+            context=context,
+        )
+        if paginated:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class IngredientViewSet(
+    ReplicaReadMixin, CachedCatalogMixin, viewsets.ReadOnlyModelViewSet
+):
     """Recipe.Ingredient ViewSet."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [IsSafeMethod]
+    query_budgets = {"list": 3, "retrieve": 3}
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
 
+    def filter_queryset(self, queryset):
+        """Redefinition filter_queryset method.
+
+        Name autocomplete returns INGREDIENT_SEARCH_LIMIT matches at most.
+        """
+        queryset = super().filter_queryset(queryset)
+        if self.action == "list" and self.request.query_params.get("name"):
+            return queryset[:settings.INGREDIENT_SEARCH_LIMIT]
+        return queryset
 
-class CustomUserViewSet(CreateListRetrieveViewSet):
+    def list(self, request, *args, **kwargs):
+        """Redefinition list method.
+
+        Serves name autocomplete from the in-process search index.
+        """
+        name = request.query_params.get("name")
+        if name and settings.INGREDIENT_SEARCH_INDEX_TIMEOUT:
+            return Response(
+                ingredient_search_index.search(
+                    name, settings.INGREDIENT_SEARCH_LIMIT
+                )
+            )
+        return super().list(request, *args, **kwargs)
+
+
+class CustomUserViewSet(ReplicaReadMixin, CreateListRetrieveViewSet):
     """Users.User ViewSet."""
     queryset = User.objects.all()
     permission_classes = [AllowAny]
     pagination_class = PageSizeInParamsPagination
+    primary_actions = ("follow",)
+    query_budgets = {
+        "list": 4,
+        "retrieve": 3,
+        "create": 6,
+        "me": 3,
+        "follow": 9,
+        "subscriptions": 5,
+        "set_password": 5,
+    }
+
+    def get_queryset(self):
+        """Redefinition get_queryset method."""
+        queryset = super().get_queryset()
+        user_me = self.request.user
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        if not user_me.is_authenticated:
+            return queryset.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(follower=user_me, author=OuterRef("pk"))
+            )
+        )
 
     def get_serializer_class(self):
         """Redefinition get_serializer_class method."""
@@ -196,33 +560,81 @@ class CustomUserViewSet(CreateListRetrieveViewSet):
         permission_classes=[CustomIsAuthenticated],
     )
     def follow(self, request, **kwargs):
-        """An action for adding or deleting Follow objects."""
+        """An action for adding or deleting Follow objects.
+
+        A follow is inserted or deleted at once, an existence of an author
+        is checked only if nothing is changed. Recipes of an author are
+        copied to a follower timeline or removed from it in the same
+        transaction.
+        """
         user_me = request.user
-        users_id = kwargs["users_id"]
-        author = get_object_or_404(User, id=users_id)
+        users_id = int(kwargs["users_id"])
         if request.method == "GET":
-            favorited_data = {
-                "follower": user_me.id,
-                "author": author.id,
-            }
-            context = {"request": request}
-            serializer = FollowSerializer(
-                data=favorited_data, context=context
+            author = get_object_or_404(User, id=users_id)
+            if author == user_me:
+                raise ValidationError(
+                    {
+                        api_settings.NON_FIELD_ERRORS_KEY: [
+                            "You can not follow yourself."
+                        ]
+                    }
+                )
+            with transaction.atomic():
+                added = Follow.objects.add_pairs(user_me.id, [author.id])
+                TimelineEntry.objects.backfill(user_me.id, added)
+            if author.id not in added:
+                raise ValidationError(
+                    {
+                        api_settings.NON_FIELD_ERRORS_KEY: [
+                            "You are already follow this author."
+                        ]
+                    }
+                )
+            instance = Follow(
+                id=added[author.id], follower=user_me, author=author
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            context = {"request": request}
+            serializer = FollowSerializer(instance, context=context)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         if request.method == "DELETE":
-            if not Follow.objects.filter(
-                follower=user_me, author=author
-            ).exists():
+            with transaction.atomic():
+                removed = Follow.objects.remove_pairs(user_me.id, [users_id])
+                if removed:
+                    TimelineEntry.objects.filter(
+                        user=user_me, author__in=removed
+                    ).delete()
+            if not removed:
+                get_object_or_404(User, id=users_id)
                 return Response(
                     {"detail": "There is no this author in your followings."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            Follow.objects.filter(follower=user_me, author=author).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_subscriptions_queryset(self, recipes_limit=None):
+        """Return follows of a current user with limited recipes."""
+        recipes = Recipe.objects.all()
+        if recipes_limit:
+            recipes = recipes.filter(
+                pk__in=Subquery(
+                    Recipe.objects.filter(author=OuterRef("author")).values(
+                        "pk"
+                    )[:recipes_limit]
+                )
+            )
+        return (
+            Follow.objects.filter(follower=self.request.user)
+            .select_related("author")
+            .prefetch_related(
+                Prefetch(
+                    "author__recipes",
+                    queryset=recipes,
+                    to_attr="limited_recipes",
+                )
+            )
+            .order_by("id")
+        )
+
     @action(
         detail=False,
         methods=["get"],
@@ -233,10 +645,13 @@ class CustomUserViewSet(CreateListRetrieveViewSet):
     )
     def subscriptions(self, request):
         """An action for getting all the subscriptions."""
-        follower = request.user
         context = {"request": request}
-        queryset = Follow.objects.filter(follower=follower)
-        page = self.paginate_queryset(queryset)
+        recipes_limit = positive_integer_in_query_params_validate(
+            query_params=request.query_params, param_name="recipes_limit"
+        )
+        page = self.paginate_queryset(
+            self.get_subscriptions_queryset(recipes_limit)
+        )
         serializer = FollowSerializer(
             page,
             context=context,
@@ -259,3 +674,12 @@ class CustomUserViewSet(CreateListRetrieveViewSet):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """Per-view request profiling metrics of the current process."""
+    permission_classes = [CustomIsAuthenticated & (IsAdmin | IsSuperUser)]
+
+    def get(self, request):
+        """Method gets percentiles of request profiles by views."""
+        return Response(view_metrics.get_summary())
@@ -2,6 +2,7 @@
 
 
 import os
+from itertools import zip_longest
 
 from dotenv import load_dotenv
 
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.v1.profiling.RequestProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -77,9 +79,89 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", default=60)),
     }
 }
 
+if "postgresql" in (DATABASES["default"]["ENGINE"] or ""):
+    DATABASES["default"]["OPTIONS"] = {
+        "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", default=5)),
+    }
+
+DB_HEALTH_CHECK_INTERVAL = int(
+    os.getenv("DB_HEALTH_CHECK_INTERVAL", default=30)
+)
+
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", default="").split()
+
+DB_REPLICA_NAMES = os.getenv("DB_REPLICA_NAMES", default="").split()
+
+for index, (host, name) in enumerate(
+    zip_longest(DB_REPLICA_HOSTS, DB_REPLICA_NAMES)
+):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host or DATABASES["default"]["HOST"],
+        "NAME": name or DATABASES["default"]["NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DB_REPLICA_STICKY_TIMEOUT = int(
+    os.getenv("DB_REPLICA_STICKY_TIMEOUT", default=10)
+)
+
+DATABASE_ROUTERS = ["api.v1.databases.ReplicaRouter"]
+
+
+# Cache
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", default="foodgram"),
+    }
+}
+
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", default=3600))
+
+
+# Request profiling
+
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", default="False") == (
+    "True"
+)
+
+REQUEST_PROFILING_SAMPLES = int(
+    os.getenv("REQUEST_PROFILING_SAMPLES", default=1000)
+)
+
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", default="False") == (
+    "True"
+)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "api.profiling": {
+            "handlers": ["console"],
+            "level": os.getenv("REQUEST_PROFILING_LOG_LEVEL", default="INFO"),
+        },
+        "recipe.images": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+    },
+}
+
 
 # Password validation
 
@@ -128,7 +210,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.v1.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend"
@@ -136,6 +218,68 @@ REST_FRAMEWORK = {
 }
 
 
+# Recipe image variants settings
+
+IMAGE_VARIANT_WIDTHS = [
+    int(width)
+    for width in os.getenv(
+        "IMAGE_VARIANT_WIDTHS", default="320 640 1280"
+    ).split()
+]
+
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", default=80))
+
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", default=2))
+
+
+# Shopping cart export settings
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    "SHOPPING_CART_PDF_FONT",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+
+# Ingredient search settings
+
+INGREDIENT_SEARCH_INDEX_TIMEOUT = int(
+    os.getenv("INGREDIENT_SEARCH_INDEX_TIMEOUT", default=300)
+)
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", default=20))
+
+
+# Recipe search settings
+
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", default="russian")
+
+RECIPE_MATCH_INDEX_TIMEOUT = int(
+    os.getenv("RECIPE_MATCH_INDEX_TIMEOUT", default=3600)
+)
+
+RECIPE_MATCH_REFRESH_INTERVAL = int(
+    os.getenv("RECIPE_MATCH_REFRESH_INTERVAL", default=5)
+)
+
+
+# Token authentication cache settings
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", default=10000))
+
+TOKEN_CACHE_LOCAL_TIMEOUT = int(
+    os.getenv("TOKEN_CACHE_LOCAL_TIMEOUT", default=30)
+)
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv("TOKEN_CACHE_TIMEOUT", default=0))
+
+
+# Follow feed settings
+
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv("FEED_FANOUT_MAX_FOLLOWERS", default=1000)
+)
+
+
 # Djoser settings
 
 DJOSER = {
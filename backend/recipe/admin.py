@@ -4,7 +4,8 @@
 from django.contrib import admin
 
 from recipe.models import (Ingredient, IngredientPortion, IsFavorited,
-                           IsInShoppingCart, Recipe, Tag)
+                           IsInShoppingCart, Recipe, ShoppingCartIngredient,
+                           Tag, TimelineEntry)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -59,12 +60,41 @@ class RecipeAdmin(admin.ModelAdmin):
         "tags",
     )
     empty_value_display = "-empty-"
+    list_select_related = ("author",)
 
     def count_favorited(self, obj):
-        """Method counts quantity of adding to favorites."""
-        return IsFavorited.objects.filter(recipe_id=obj.id).count()
+        """Method gets quantity of adding to favorites."""
+        return obj.favorites_count
 
     count_favorited.short_description = "Favorited counter"
+    count_favorited.admin_order_field = "favorites_count"
+
+
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    """ShoppingCartIngredient model admin config.
+
+    Totals are kept by changes of carts and portions, so they are shown
+    read-only.
+    """
+    list_display = (
+        "user",
+        "ingredient",
+        "total_amount",
+    )
+    search_fields = ("user__username",)
+    list_select_related = ("user", "ingredient")
+
+    def has_add_permission(self, request):
+        """Totals can not be added by hand."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Totals can not be changed by hand."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Totals can not be deleted by hand."""
+        return False
 
 
 admin.site.register(Tag, TagAdmin)
@@ -73,3 +103,5 @@ admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(IngredientPortion)
 admin.site.register(IsFavorited)
 admin.site.register(IsInShoppingCart)
+admin.site.register(ShoppingCartIngredient, ShoppingCartIngredientAdmin)
+admin.site.register(TimelineEntry)
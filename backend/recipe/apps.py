@@ -6,3 +6,7 @@ from django.apps import AppConfig
 
 class RecipeConfig(AppConfig):
     name = "recipe"
+
+    def ready(self):
+        """Connect recipe signals."""
+        import recipe.signals  # noqa: F401
@@ -0,0 +1,18 @@
+"""Bulk queries helpers."""
+
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def get_bulk_batch_size(model, batch_size, using=DEFAULT_DB_ALIAS):
+    """Return a batch size of model inserts within a database limit.
+
+    Django 2.2 does not clamp a given batch size, so SQLite fails on more
+    than 500 rows per INSERT. None is kept, Django picks a size itself.
+    """
+    if not batch_size:
+        return None
+    max_batch_size = connections[using].ops.bulk_batch_size(
+        model._meta.concrete_fields, [None] * batch_size
+    )
+    return min(batch_size, max(max_batch_size, 1))
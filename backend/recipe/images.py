@@ -0,0 +1,98 @@
+"""Recipe image variants."""
+
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+
+from recipe.models import Recipe
+
+logger = logging.getLogger("recipe.images")
+
+VARIANT_FORMAT = "webp"
+VARIANTS_DIRECTORY = "variants"
+
+executor = (
+    ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS)
+    if settings.IMAGE_VARIANT_WORKERS
+    else None
+)
+
+
+def get_variant_name(image_name, width):
+    """Return a storage name of an image variant."""
+    root = os.path.splitext(image_name)[0]
+    return f"{VARIANTS_DIRECTORY}/{root}_{width}w.{VARIANT_FORMAT}"
+
+
+def make_variants(recipe_id):
+    """Save resized WebP variants of a recipe image to a storage."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only("image").first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open("rb") as file, Image.open(file) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            variant = image.copy()
+            variant.thumbnail((width, image.height), Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(
+                buffer,
+                format=VARIANT_FORMAT,
+                quality=settings.IMAGE_VARIANT_QUALITY,
+            )
+            name = get_variant_name(recipe.image.name, width)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    Recipe.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+        image_variants_ready=True
+    )
+
+
+def make_variants_in_worker(recipe_id):
+    """Make image variants in a worker thread.
+
+    A worker thread opens its own database connection, it is closed after
+    every task.
+    """
+    try:
+        make_variants(recipe_id)
+    finally:
+        connection.close()
+
+
+def log_failed_variants(recipe_id, future):
+    """Log an error of a variants task, a recipe keeps no variants."""
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error(
+            "Image variants of recipe %s failed.",
+            recipe_id,
+            exc_info=(type(error), error, error.__traceback__),
+        )
+
+
+def submit_variants(recipe_id):
+    """Submit a variants task to the worker pool."""
+    future = executor.submit(make_variants_in_worker, recipe_id)
+    future.add_done_callback(partial(log_failed_variants, recipe_id))
+    return future
+
+
+def schedule_variants(recipe):
+    """Make image variants in a worker pool after a transaction commit."""
+    if executor is None:
+        transaction.on_commit(partial(make_variants, recipe.pk))
+    else:
+        transaction.on_commit(partial(submit_variants, recipe.pk))
@@ -0,0 +1,60 @@
+"""A management command for backfilling follow feed timelines."""
+
+
+from django.core.management.base import BaseCommand
+
+from recipe.models import TimelineEntry
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = (
+        "Rebuild follow feed timelines from follows and recipes, "
+        "recipes which are not fanned out are skipped"
+    )
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "--users",
+            type=int,
+            nargs="+",
+            help="Ids of users which timelines are rebuilt, all by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Users per one transaction",
+        )
+
+    def get_users_ids(self):
+        """Return ids of users which follow anyone or have a timeline."""
+        users_ids = set(
+            Follow.objects.order_by()
+            .values_list("follower", flat=True)
+            .distinct()
+        )
+        users_ids.update(
+            TimelineEntry.objects.order_by()
+            .values_list("user", flat=True)
+            .distinct()
+        )
+        return sorted(users_ids)
+
+    def handle(self, *args, **options):
+        """A method for backfilling follow feed timelines."""
+        users_ids = options["users"] or self.get_users_ids()
+        batch_size = options["batch_size"]
+        entries_count = 0
+        for start in range(0, len(users_ids), batch_size):
+            entries_count += TimelineEntry.objects.rebuild(
+                users_ids[start:start + batch_size]
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{entries_count} timeline entries of {len(users_ids)} "
+                f"users are backfilled."
+            )
+        )
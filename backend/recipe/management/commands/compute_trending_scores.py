@@ -0,0 +1,79 @@
+"""A management command for computing recipes trending scores."""
+
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipe.models import IsFavorited, IsInShoppingCart, Recipe
+
+ACTIVITY_WEIGHTS = (
+    (IsFavorited, 1.0),
+    (IsInShoppingCart, 0.5),
+)
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = "Compute time-decayed trending scores of recipes"
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "--half-life-hours",
+            type=float,
+            default=72,
+            help="Hours after which an activity weighs a half",
+        )
+        parser.add_argument(
+            "--window-days",
+            type=int,
+            default=30,
+            help="Days of activity to take into account",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Recipes per one UPDATE query",
+        )
+
+    def get_scores(self, now, half_life_hours, window_days):
+        """Sum exponentially decayed weights of recent activities."""
+        scores = defaultdict(float)
+        since = now - timedelta(days=window_days)
+        for model, weight in ACTIVITY_WEIGHTS:
+            activities = model.objects.filter(created__gte=since).values_list(
+                "recipe", "created"
+            )
+            for recipe_id, created in activities.iterator():
+                age_hours = (now - created).total_seconds() / 3600
+                scores[recipe_id] += weight * 0.5 ** (
+                    age_hours / half_life_hours
+                )
+        return scores
+
+    def handle(self, *args, **options):
+        """A method for computing and saving trending scores."""
+        scores = self.get_scores(
+            now=timezone.now(),
+            half_life_hours=options["half_life_hours"],
+            window_days=options["window_days"],
+        )
+        recipes = [
+            Recipe(pk=recipe_id, trending_score=score)
+            for recipe_id, score in scores.items()
+        ]
+        with transaction.atomic():
+            Recipe.objects.exclude(trending_score=0).update(trending_score=0)
+            Recipe.objects.bulk_update(
+                recipes, ["trending_score"], batch_size=options["batch_size"]
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Trending scores of {len(recipes)} recipes are computed."
+            )
+        )
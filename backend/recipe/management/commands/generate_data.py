@@ -0,0 +1,241 @@
+"""A management command for generating a synthetic dataset."""
+
+
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.v1.cache import invalidate_catalog
+from recipe.bulk import get_bulk_batch_size
+from recipe.models import (Ingredient, IngredientPortion, IsFavorited,
+                           IsInShoppingCart, Recipe, Tag)
+from users.models import Follow, User
+
+USERNAME_PREFIX = "synthetic"
+SYNTHETIC_PASSWORD = "synthetic-password"
+MEASUREMENT_UNITS = ("г", "кг", "мл", "л", "шт.", "ст. л.", "ч. л.")
+PUB_DATE_SPREAD_DAYS = 365
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = "Generate a synthetic dataset of a given size with bulk inserts"
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--recipes-per-user", type=int, default=10)
+        parser.add_argument("--ingredients", type=int, default=500)
+        parser.add_argument("--tags", type=int, default=5)
+        parser.add_argument("--portions-per-recipe", type=int, default=8)
+        parser.add_argument("--tags-per-recipe", type=int, default=2)
+        parser.add_argument("--follows-per-user", type=int, default=10)
+        parser.add_argument("--favorites-per-user", type=int, default=20)
+        parser.add_argument("--cart-recipes-per-user", type=int, default=5)
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="Random seed, the same seed gives the same dataset",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Rows per one INSERT query within a database limit, "
+            "the limit by default",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete a previously generated dataset first",
+        )
+
+    def create_tags(self, count):
+        """Return synthetic tags, missing ones are created."""
+        tags = []
+        for i in range(count):
+            tag, _ = Tag.objects.get_or_create(
+                slug=f"{USERNAME_PREFIX}-{i}",
+                defaults={
+                    "name": f"Synthetic tag {i}",
+                    "color": f"#5{i:05x}",
+                },
+            )
+            tags.append(tag)
+        return tags
+
+    def create_ingredients(self, rng, count, batch_size):
+        """Return ids of at least a given number of ingredients."""
+        missing_count = count - Ingredient.objects.count()
+        if missing_count > 0:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f"synthetic ingredient {i}",
+                        measurement_unit=rng.choice(MEASUREMENT_UNITS),
+                    )
+                    for i in range(missing_count)
+                ),
+                batch_size=get_bulk_batch_size(Ingredient, batch_size),
+                ignore_conflicts=True,
+            )
+            invalidate_catalog(Ingredient)
+        return list(
+            Ingredient.objects.order_by("id").values_list("id", flat=True)
+        )
+
+    def create_users(self, count, batch_size):
+        """Return ids of created synthetic users."""
+        password = make_password(SYNTHETIC_PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f"{USERNAME_PREFIX}{i}",
+                    email=f"{USERNAME_PREFIX}{i}@example.com",
+                    first_name="Synthetic",
+                    last_name=f"User {i}",
+                    password=password,
+                )
+                for i in range(count)
+            ),
+            batch_size=get_bulk_batch_size(User, batch_size),
+        )
+        return list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def create_recipes(self, rng, users_ids, per_user, batch_size):
+        """Return ids of created recipes spread over a publication year."""
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=author_id,
+                    name=f"Synthetic recipe {author_id}-{i}",
+                    text="Synthetic recipe text.",
+                    cooking_time=rng.randint(1, 180),
+                    image="synthetic.png",
+                )
+                for author_id in users_ids
+                for i in range(per_user)
+            ),
+            batch_size=get_bulk_batch_size(Recipe, batch_size),
+        )
+        recipes = list(
+            Recipe.objects.filter(author_id__in=users_ids).order_by("id")
+        )
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=rng.randint(0, PUB_DATE_SPREAD_DAYS * 24 * 3600)
+            )
+        Recipe.objects.bulk_update(recipes, ["pub_date"], batch_size)
+        return [recipe.id for recipe in recipes]
+
+    def sample_pairs(self, rng, left_ids, right_ids, per_left, exclude_self):
+        """Yield distinct random (left, right) pairs."""
+        sample_size = min(per_left + int(exclude_self), len(right_ids))
+        for left_id in left_ids:
+            right_sample = [
+                right_id
+                for right_id in rng.sample(right_ids, sample_size)
+                if not exclude_self or right_id != left_id
+            ]
+            for right_id in right_sample[:per_left]:
+                yield left_id, right_id
+
+    def handle(self, *args, **options):
+        """A method for generating a synthetic dataset."""
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        generated = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        if generated.exists():
+            if not options["clear"]:
+                raise CommandError(
+                    "A synthetic dataset already exists, use --clear."
+                )
+            generated.delete()
+        started = time.monotonic()
+        with transaction.atomic():
+            tags_ids = [tag.id for tag in self.create_tags(options["tags"])]
+            ingredients_ids = self.create_ingredients(
+                rng, options["ingredients"], batch_size
+            )
+            users_ids = self.create_users(options["users"], batch_size)
+            recipes_ids = self.create_recipes(
+                rng, users_ids, options["recipes_per_user"], batch_size
+            )
+            Recipe.tags.through.objects.bulk_create(
+                (
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id, tag_id in self.sample_pairs(
+                        rng, recipes_ids, tags_ids,
+                        options["tags_per_recipe"], False,
+                    )
+                ),
+                batch_size=get_bulk_batch_size(
+                    Recipe.tags.through, batch_size
+                ),
+            )
+            IngredientPortion.objects.bulk_create(
+                (
+                    IngredientPortion(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=rng.randint(1, 500),
+                    )
+                    for recipe_id, ingredient_id in self.sample_pairs(
+                        rng, recipes_ids, ingredients_ids,
+                        options["portions_per_recipe"], False,
+                    )
+                ),
+                batch_size=get_bulk_batch_size(IngredientPortion, batch_size),
+            )
+            Follow.objects.bulk_create(
+                (
+                    Follow(follower_id=follower_id, author_id=author_id)
+                    for follower_id, author_id in self.sample_pairs(
+                        rng, users_ids, users_ids,
+                        options["follows_per_user"], True,
+                    )
+                ),
+                batch_size=get_bulk_batch_size(Follow, batch_size),
+            )
+            for model, per_user in (
+                (IsFavorited, options["favorites_per_user"]),
+                (IsInShoppingCart, options["cart_recipes_per_user"]),
+            ):
+                model.objects.bulk_create(
+                    (
+                        model(user_id=user_id, recipe_id=recipe_id)
+                        for user_id, recipe_id in self.sample_pairs(
+                            rng, users_ids, recipes_ids, per_user, False
+                        )
+                    ),
+                    batch_size=get_bulk_batch_size(model, batch_size),
+                )
+            Recipe.objects.filter(
+                pk__in=recipes_ids
+            ).update_search_vectors()
+            call_command("reconcile_counters", stdout=self.stdout)
+            call_command("backfill_timelines", stdout=self.stdout)
+            call_command(
+                "rebuild_cart_totals",
+                batch_size=batch_size,
+                stdout=self.stdout,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(users_ids)} users and {len(recipes_ids)} recipes "
+                f"generated in {time.monotonic() - started:.2f} s. "
+                f"Users log in as {USERNAME_PREFIX}<N>@example.com "
+                f"with the {SYNTHETIC_PASSWORD} password."
+            )
+        )
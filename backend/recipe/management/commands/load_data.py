@@ -2,22 +2,125 @@
 
 
 import csv
+import json
+import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.v1.cache import invalidate_catalog
+from recipe.bulk import get_bulk_batch_size
 from recipe.models import Ingredient
 
+DEFAULT_DATA_PATH = os.path.join(
+    settings.BASE_DIR, "recipe", "data", "ingredients.csv"
+)
+
+
+def read_csv(file):
+    """Yield name and measurement unit pairs from a CSV file."""
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Yield name and measurement unit pairs from a JSON file."""
+    for item in json.load(file):
+        yield item["name"], item["measurement_unit"]
+
+
+READERS = {
+    "csv": read_csv,
+    "json": read_json,
+}
+
 
 class Command(BaseCommand):
     """Command definition."""
     help = "Load ingredients data to DB"
 
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=DEFAULT_DATA_PATH,
+            help="Path to a CSV or JSON file with ingredients",
+        )
+        parser.add_argument(
+            "--format",
+            choices=READERS.keys(),
+            help="File format, a file extension is used by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Ingredients per one INSERT query within a database limit",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Read and deduplicate a file without writing to DB",
+        )
+
+    def get_reader(self, path, file_format):
+        """Return a reader for a given or guessed file format."""
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format not in READERS:
+            raise CommandError(
+                f"Unknown file format: {file_format}. "
+                f"Use one of: {', '.join(READERS)}."
+            )
+        return READERS[file_format]
+
+    def write_batch(self, batch, dry_run):
+        """Write a batch of new ingredients ignoring existing ones."""
+        if not dry_run:
+            Ingredient.objects.bulk_create(
+                batch,
+                batch_size=get_bulk_batch_size(Ingredient, len(batch)),
+                ignore_conflicts=True,
+            )
+        return len(batch)
+
     def handle(self, *args, **options):
         """A method for fulfilling database with ingredients data."""
-        with open("recipe/data/ingredients.csv", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name, measurement_unit=measurement_unit
+        path = options["path"]
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+        reader = self.get_reader(path, options["format"])
+        started = time.monotonic()
+        seen = set(Ingredient.objects.values_list("name", "measurement_unit"))
+        rows_count = 0
+        created_count = 0
+        batch = []
+        with open(path, encoding="utf-8") as f, transaction.atomic():
+            for name, measurement_unit in reader(f):
+                rows_count += 1
+                key = (name.strip(), measurement_unit.strip())
+                if key in seen:
+                    continue
+                seen.add(key)
+                batch.append(
+                    Ingredient(name=key[0], measurement_unit=key[1])
                 )
+                if len(batch) >= batch_size:
+                    created_count += self.write_batch(batch, dry_run)
+                    batch = []
+            created_count += self.write_batch(batch, dry_run)
+        if created_count and not dry_run:
+            invalidate_catalog(Ingredient)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        action = "would be loaded" if dry_run else "loaded"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{rows_count} rows read, {created_count} new ingredients "
+                f"{action} in {elapsed:.2f} s "
+                f"({rows_count / elapsed:.0f} rows/sec)."
+            )
+        )
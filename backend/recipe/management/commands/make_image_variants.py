@@ -0,0 +1,34 @@
+"""A management command for making recipe image variants."""
+
+
+from django.core.management.base import BaseCommand
+
+from recipe.images import make_variants
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = "Make resized image variants of recipes"
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Remake variants of recipes which already have them",
+        )
+
+    def handle(self, *args, **options):
+        """A method for making missing image variants."""
+        recipes = Recipe.objects.all()
+        if not options["all"]:
+            recipes = recipes.filter(image_variants_ready=False)
+        recipes_ids = list(recipes.values_list("id", flat=True))
+        for recipe_id in recipes_ids:
+            make_variants(recipe_id)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Image variants of {len(recipes_ids)} recipes are made."
+            )
+        )
@@ -0,0 +1,60 @@
+"""A management command for rebuilding shopping cart totals."""
+
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = "Rebuild shopping cart totals and verify them against live data"
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Only compare stored totals with live data",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Rows per one INSERT query within a database limit, "
+            "the limit by default",
+        )
+
+    def get_mismatches(self):
+        """Return keys of totals which differ from live data."""
+        live = {
+            (row["recipe__customers__user"], row["ingredient"]): row["total"]
+            for row in ShoppingCartIngredient.objects.live_totals().iterator()
+        }
+        stored = {
+            (row["user"], row["ingredient"]): row["total_amount"]
+            for row in ShoppingCartIngredient.objects.values(
+                "user", "ingredient", "total_amount"
+            ).iterator()
+        }
+        return {
+            key
+            for key in live.keys() | stored.keys()
+            if live.get(key) != stored.get(key)
+        }
+
+    def handle(self, *args, **options):
+        """A method for rebuilding and verifying shopping cart totals."""
+        if not options["verify_only"]:
+            ShoppingCartIngredient.objects.rebuild(
+                batch_size=options["batch_size"]
+            )
+            self.stdout.write("Shopping cart totals are rebuilt.")
+        mismatches = self.get_mismatches()
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} shopping cart totals do not match "
+                f"live data."
+            )
+        self.stdout.write(
+            self.style.SUCCESS("Shopping cart totals match live data.")
+        )
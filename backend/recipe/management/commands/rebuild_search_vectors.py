@@ -0,0 +1,37 @@
+"""A management command for rebuilding recipe search vectors."""
+
+
+from django.core.management.base import BaseCommand
+
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = "Rebuild recipe search vectors, PostgreSQL only"
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Recipes per one UPDATE query",
+        )
+
+    def handle(self, *args, **options):
+        """A method for rebuilding recipe search vectors."""
+        batch_size = options["batch_size"]
+        recipes_ids = list(
+            Recipe.objects.order_by("id").values_list("id", flat=True)
+        )
+        updated_count = 0
+        for start in range(0, len(recipes_ids), batch_size):
+            updated_count += Recipe.objects.filter(
+                pk__in=recipes_ids[start:start + batch_size]
+            ).update_search_vectors()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{updated_count} recipe search vectors are rebuilt."
+            )
+        )
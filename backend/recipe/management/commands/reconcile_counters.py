@@ -0,0 +1,75 @@
+"""A management command for reconciling denormalized counters."""
+
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipe.models import IsFavorited, IsInShoppingCart, Recipe
+from users.models import Follow, User
+
+
+def get_live_count(model, field_name):
+    """Return an expression counting model rows related to an outer row."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field_name: OuterRef("pk")})
+            .order_by()
+            .values(field_name)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+COUNTERS = (
+    (Recipe, "favorites_count", IsFavorited, "recipe"),
+    (Recipe, "in_carts_count", IsInShoppingCart, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Follow, "author"),
+)
+
+
+class Command(BaseCommand):
+    """Command definition."""
+    help = "Reconcile favorites, carts, recipes and followers counters"
+
+    def add_arguments(self, parser):
+        """Definition of command arguments."""
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Only count rows with wrong counters",
+        )
+
+    def get_mismatches_count(self):
+        """Return a number of rows with counters not equal to live data."""
+        mismatches_count = 0
+        for model, counter, related_model, field_name in COUNTERS:
+            mismatches_count += (
+                model.objects.annotate(
+                    live_count=get_live_count(related_model, field_name)
+                )
+                .exclude(**{counter: F("live_count")})
+                .count()
+            )
+        return mismatches_count
+
+    def handle(self, *args, **options):
+        """A method for reconciling counters with live data."""
+        if not options["verify_only"]:
+            with transaction.atomic():
+                for model, counter, related_model, field_name in COUNTERS:
+                    model.objects.update(
+                        **{counter: get_live_count(related_model, field_name)}
+                    )
+            self.stdout.write("Counters are reconciled.")
+        mismatches_count = self.get_mismatches_count()
+        if mismatches_count:
+            raise CommandError(
+                f"{mismatches_count} counters do not match live data."
+            )
+        self.stdout.write(self.style.SUCCESS("Counters match live data."))
@@ -0,0 +1,86 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:50
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+MAX_PORTION_AMOUNT = 32767
+
+
+# get_or_create did not keep name and measurement unit pairs unique, so
+# duplicates are merged into the oldest ingredient before the constraint.
+# Portions and cart totals of one recipe or user are summed up.
+def merge_rows(model, owner_field, amount_field, kept_id, duplicate_ids,
+               db_alias, max_amount=None):
+    rows_by_owner = {}
+    for row in model.objects.using(db_alias).filter(
+        ingredient__in=[kept_id, *duplicate_ids]
+    ).order_by('pk'):
+        rows_by_owner.setdefault(
+            getattr(row, f'{owner_field}_id'), []
+        ).append(row)
+    for rows in rows_by_owner.values():
+        rows.sort(key=lambda row: row.ingredient_id != kept_id)
+        kept_row, *merged_rows = rows
+        amount = sum(getattr(row, amount_field) for row in rows)
+        if max_amount is not None:
+            amount = min(amount, max_amount)
+        model.objects.using(db_alias).filter(
+            pk__in=[row.pk for row in merged_rows]
+        ).delete()
+        model.objects.using(db_alias).filter(pk=kept_row.pk).update(
+            ingredient=kept_id, **{amount_field: amount}
+        )
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    IngredientPortion = apps.get_model('recipe', 'IngredientPortion')
+    ShoppingCartIngredient = apps.get_model(
+        'recipe', 'ShoppingCartIngredient'
+    )
+    duplicates = (
+        Ingredient.objects.using(db_alias)
+        .values('name', 'measurement_unit')
+        .annotate(kept_id=Min('id'), ingredients_count=Count('id'))
+        .filter(ingredients_count__gt=1)
+        .order_by()
+    )
+    for group in list(duplicates):
+        duplicate_ids = list(
+            Ingredient.objects.using(db_alias)
+            .filter(
+                name=group['name'],
+                measurement_unit=group['measurement_unit'],
+            )
+            .exclude(pk=group['kept_id'])
+            .values_list('pk', flat=True)
+        )
+        merge_rows(
+            IngredientPortion, 'recipe', 'amount', group['kept_id'],
+            duplicate_ids, db_alias, MAX_PORTION_AMOUNT,
+        )
+        merge_rows(
+            ShoppingCartIngredient, 'user', 'total_amount',
+            group['kept_id'], duplicate_ids, db_alias,
+        )
+        Ingredient.objects.using(db_alias).filter(
+            pk__in=duplicate_ids
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0003_auto_20261018_0449'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_pair'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:52
+
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_ingredient_name_lower_prefix '
+        'ON recipe_ingredient (lower(name) text_pattern_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_ingredient_name_lower_trgm '
+        'ON recipe_ingredient USING gin (lower(name) gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipe_ingredient_name_lower_prefix'
+    )
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipe_ingredient_name_lower_trgm'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_auto_20261018_0450'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
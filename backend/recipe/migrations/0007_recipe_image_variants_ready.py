@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_ready',
+            field=models.BooleanField(default=False, verbose_name='Recipe image variants are ready'),
+        ),
+    ]
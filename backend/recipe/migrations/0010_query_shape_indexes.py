@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_recipe_ordering'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredientportion',
+            index=models.Index(fields=['recipe', 'ingredient', 'amount'], name='portion_recipe_covering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='isfavorited',
+            index=models.Index(fields=['created'], name='favorited_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='isinshoppingcart',
+            index=models.Index(fields=['created'], name='in_cart_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_feed_idx'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON recipe_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipe_tags_tag_recipe_idx',
+        ),
+    ]
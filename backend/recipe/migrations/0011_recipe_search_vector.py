@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:10
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_search_vector_gin '
+        'ON recipe_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0010_query_shape_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Search vector'),
+        ),
+        migrations.RunPython(
+            create_search_vector_index, drop_search_vector_index
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0012_recipe_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Recipe publication date')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fanned_out_entries', to=settings.AUTH_USER_MODEL, verbose_name='Recipe author')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipe.Recipe', verbose_name='Recipe in timeline')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL, verbose_name='Timeline owner')),
+            ],
+            options={
+                'verbose_name': 'Timeline entry',
+                'verbose_name_plural': 'Timeline entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='timeline_user_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_timeline_pair'),
+        ),
+    ]
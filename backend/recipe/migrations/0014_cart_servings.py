@@ -0,0 +1,19 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:19
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0013_timeline_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='isinshoppingcart',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1, message='Servings multiplier can not be less than 1.')], verbose_name='Servings multiplier'),
+        ),
+    ]
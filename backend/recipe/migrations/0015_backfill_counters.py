@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipe', 'Recipe', 'favorites_count', 'recipe', 'IsFavorited', 'recipe'),
+    ('recipe', 'Recipe', 'in_carts_count', 'recipe', 'IsInShoppingCart', 'recipe'),
+    ('users', 'User', 'recipes_count', 'recipe', 'Recipe', 'author'),
+    ('users', 'User', 'followers_count', 'users', 'Follow', 'author'),
+)
+
+
+def backfill_counters(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    for (
+        app_label, model_name, counter,
+        related_app_label, related_model_name, field_name,
+    ) in COUNTERS:
+        model = apps.get_model(app_label, model_name)
+        related_model = apps.get_model(related_app_label, related_model_name)
+        live_count = Subquery(
+            related_model.objects.using(db_alias)
+            .filter(**{field_name: OuterRef('pk')})
+            .order_by()
+            .values(field_name)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        )
+        model.objects.using(db_alias).update(
+            **{counter: Coalesce(live_count, 0)}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0014_cart_servings'),
+        ('users', '0004_follow_author_follower_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
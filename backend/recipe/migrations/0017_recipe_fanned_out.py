@@ -0,0 +1,32 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Recipes of authors above the fan-out threshold were never copied to
+# timelines, so they keep being merged into feeds on read.
+def mark_pulled_recipes(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Recipe.objects.using(schema_editor.connection.alias).filter(
+        author__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).update(fanned_out=False)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0015_backfill_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='fanned_out',
+            field=models.BooleanField(default=True, verbose_name='Recipe is fanned out to follower timelines'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(fanned_out=False), fields=['author', '-pub_date'], name='recipe_pulled_feed_idx'),
+        ),
+        migrations.RunPython(mark_pulled_recipes, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,18 @@
 """Recipe models description."""
 
 
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import (BooleanField, Count, Exists, F, OuterRef,
+                              Prefetch, Subquery, Sum, TextField, Value)
 
-from users.models import User
+from recipe.bulk import get_bulk_batch_size
+from users.models import Follow, PairMixin, PairQuerySet, User
 
 
 class Tag(models.Model):
@@ -54,12 +62,115 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = "Ingredient"
         verbose_name_plural = "Ingredients"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient_pair",
+            ),
+        ]
 
     def __str__(self):
         """Returns string view for name and measurement_unit fields."""
         return "{}, {}".format(self.name, self.measurement_unit)
 
 
+def get_search_vector():
+    """Return a weighted search vector of a name, a text and ingredients."""
+    ingredient_names = Subquery(
+        IngredientPortion.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", delimiter=" "))
+        .values("names"),
+        output_field=TextField(),
+    )
+    return (
+        SearchVector("name", weight="A", config=settings.SEARCH_CONFIG)
+        + SearchVector("text", weight="B", config=settings.SEARCH_CONFIG)
+        + SearchVector(
+            ingredient_names, weight="C", config=settings.SEARCH_CONFIG
+        )
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Recipe custom queryset."""
+    def delete(self):
+        """Delete recipes and decrease recipes counters of authors in bulk.
+
+        Recipes deleted with their author are not counted by a cascade.
+        Shopping cart totals of customers of the recipes are refreshed.
+        """
+        self._for_write = True
+        totals = ShoppingCartIngredient.objects.using(self.db)
+        with transaction.atomic(using=self.db):
+            recipes = self.values("pk")
+            users = totals.get_customers(recipes)
+            ingredients = totals.get_ingredients(recipes)
+            authors_by_count = defaultdict(list)
+            for author_id, recipes_count in (
+                self.order_by()
+                .values_list("author")
+                .annotate(recipes_count=Count("pk"))
+            ):
+                authors_by_count[recipes_count].append(author_id)
+            for recipes_count, authors_ids in authors_by_count.items():
+                User.objects.filter(
+                    pk__in=authors_ids, recipes_count__gte=recipes_count
+                ).update(recipes_count=F("recipes_count") - recipes_count)
+            deleted = super().delete()
+            totals.refresh(users, ingredients)
+            return deleted
+
+    def with_related(self):
+        """Load an author, tags and ingredients in a constant query count.
+
+        A search vector is used by filters only and is not loaded.
+        """
+        return (
+            self.select_related("author")
+            .defer("search_vector")
+            .prefetch_related(
+                "tags",
+                Prefetch(
+                    "ingredients_in_portion",
+                    queryset=IngredientPortion.objects.select_related(
+                        "ingredient"
+                    ),
+                ),
+            )
+        )
+
+    def with_user_flags(self, user):
+        """Annotate is_favorited, is_in_shopping_cart and is_subscribed."""
+        if not user.is_authenticated:
+            false_value = Value(False, output_field=BooleanField())
+            return self.annotate(
+                is_favorited=false_value,
+                is_in_shopping_cart=false_value,
+                is_subscribed=false_value,
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                IsFavorited.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                IsInShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef("pk")
+                )
+            ),
+            is_subscribed=Exists(
+                Follow.objects.filter(follower=user, author=OuterRef("author"))
+            ),
+        )
+
+    def update_search_vectors(self):
+        """Recalculate search vectors on PostgreSQL, a no-op elsewhere."""
+        if connections[self.db].vendor != "postgresql":
+            return 0
+        return self.update(search_vector=get_search_vector())
+
+
 class Recipe(models.Model):
     """Recipe model description."""
     tags = models.ManyToManyField(
@@ -86,6 +197,10 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name="Recipe image",
     )
+    image_variants_ready = models.BooleanField(
+        default=False,
+        verbose_name="Recipe image variants are ready",
+    )
     text = models.CharField(
         max_length=1000,
         verbose_name="Recipe description",
@@ -103,19 +218,142 @@ class Recipe(models.Model):
         db_index=True,
         verbose_name="Recipe publication date",
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Recipe update date",
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Favorites counter",
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Shopping carts counter",
+    )
+    trending_score = models.FloatField(
+        default=0,
+        verbose_name="Trending score",
+    )
+    fanned_out = models.BooleanField(
+        default=True,
+        verbose_name="Recipe is fanned out to follower timelines",
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Search vector",
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ("favorites_count", "in_carts_count")
+    search_fields = ("search_vector",)
 
     class Meta:
         verbose_name = "Recipe"
         verbose_name_plural = "Recipes"
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"],
+                name="recipe_feed_idx",
+            ),
+            models.Index(
+                fields=["author", "-pub_date"],
+                name="recipe_author_feed_idx",
+            ),
+            models.Index(
+                fields=["-favorites_count", "-pub_date"],
+                name="recipe_popular_idx",
+            ),
+            models.Index(
+                fields=["-trending_score", "-pub_date"],
+                name="recipe_trending_idx",
+            ),
+            models.Index(
+                fields=["cooking_time", "-pub_date"],
+                name="recipe_cooking_time_idx",
+            ),
+            models.Index(
+                fields=["updated_at"],
+                name="recipe_updated_idx",
+            ),
+            models.Index(
+                fields=["author", "-pub_date"],
+                name="recipe_pulled_feed_idx",
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
 
     def __str__(self):
         """Returns string view for a name field."""
         return self.name
 
+    def delete(self, using=None, keep_parents=False):
+        """Delete a recipe and decrease a recipes counter of an author.
+
+        Shopping cart totals of customers of a recipe are refreshed.
+        """
+        using = using or router.db_for_write(type(self), instance=self)
+        totals = ShoppingCartIngredient.objects.using(using)
+        with transaction.atomic(using=using, savepoint=False):
+            users = totals.get_customers([self.pk])
+            ingredients = totals.get_ingredients([self.pk])
+            User.objects.using(using).filter(
+                pk=self.author_id, recipes_count__gt=0
+            ).update(recipes_count=F("recipes_count") - 1)
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            totals.refresh(users, ingredients)
+            return deleted
+
+    def save(self, *args, **kwargs):
+        """Save every field except counters of an existing object.
+
+        Counters are changed by F-expressions only and a search vector
+        by update_search_vectors, a stale value of an object loaded
+        earlier must not overwrite them.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.name not in self.search_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class IngredientPortionQuerySet(models.QuerySet):
+    """IngredientPortion custom queryset."""
+    def delete(self, refresh_totals=True):
+        """Delete portions and refresh shopping cart totals of them.
+
+        Callers refreshing totals of other changes too skip a refresh.
+        """
+        if not refresh_totals:
+            return super().delete()
+        self._for_write = True
+        totals = ShoppingCartIngredient.objects.using(self.db)
+        with transaction.atomic(using=self.db):
+            users = totals.get_customers(self.values("recipe"))
+            ingredients = list(
+                self.order_by()
+                .values_list("ingredient", flat=True)
+                .distinct()
+            )
+            deleted = super().delete()
+            totals.refresh(users, ingredients)
+            return deleted
+
 
 class IngredientPortion(models.Model):
-    """IngredientPortion model description."""
+    """IngredientPortion model description.
+
+    Saving or deleting a portion, e.g. in the admin, refreshes shopping
+    cart totals of customers of its recipe. Bulk writes of the API
+    refresh them by themselves.
+    """
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
@@ -137,17 +375,56 @@ class IngredientPortion(models.Model):
         verbose_name="Portion size",
     )
 
+    objects = IngredientPortionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Portion"
         verbose_name_plural = "Portions"
+        indexes = [
+            models.Index(
+                fields=["recipe", "ingredient", "amount"],
+                name="portion_recipe_covering_idx",
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["recipe", "ingredient"], name="unique_portion_pair"
             ),
         ]
 
+    def delete(self, using=None, keep_parents=False):
+        """Redefinition delete method."""
+        return (
+            type(self)._default_manager.using(using)
+            .filter(pk=self.pk)
+            .delete()
+        )
+
+    def save(self, *args, **kwargs):
+        """Save a portion and refresh shopping cart totals of it.
+
+        A recipe and an ingredient of a changed portion are refreshed too.
+        """
+        using = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self
+        )
+        totals = ShoppingCartIngredient.objects.using(using)
+        with transaction.atomic(using=using, savepoint=False):
+            pairs = {(self.recipe_id, self.ingredient_id)}
+            if not self._state.adding:
+                pairs.update(
+                    type(self)._default_manager.using(using)
+                    .filter(pk=self.pk)
+                    .values_list("recipe", "ingredient")
+                )
+            super().save(*args, **kwargs)
+            recipes, ingredients = zip(*pairs)
+            totals.refresh(
+                totals.get_customers(set(recipes)), list(set(ingredients))
+            )
 
-class IsFavorited(models.Model):
+
+class IsFavorited(PairMixin, models.Model):
     """IsFavorited model description."""
     user = models.ForeignKey(
         User,
@@ -163,10 +440,22 @@ class IsFavorited(models.Model):
         related_name="followers",
         verbose_name="Favorited recipe",
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Adding date",
+    )
+
+    objects = PairQuerySet.as_manager()
+
+    pair_fields = ("user", "recipe")
+    target_counter = "favorites_count"
 
     class Meta:
         verbose_name = "Favorite"
         verbose_name_plural = "Favorites"
+        indexes = [
+            models.Index(fields=["created"], name="favorited_created_idx"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["user", "recipe"], name="unique_favorited_pair"
@@ -174,8 +463,29 @@ class IsFavorited(models.Model):
         ]
 
 
-class IsInShoppingCart(models.Model):
-    """IsInShoppingCart model description."""
+class ShoppingCartQuerySet(PairQuerySet):
+    """IsInShoppingCart custom queryset."""
+    def delete(self):
+        """Delete cart items and refresh shopping cart totals of them."""
+        self._for_write = True
+        totals = ShoppingCartIngredient.objects.using(self.db)
+        with transaction.atomic(using=self.db):
+            users = list(
+                self.order_by().values_list("user", flat=True).distinct()
+            )
+            ingredients = totals.get_ingredients(self.values("recipe"))
+            deleted = super().delete()
+            totals.refresh(users, ingredients)
+            return deleted
+
+
+class IsInShoppingCart(PairMixin, models.Model):
+    """IsInShoppingCart model description.
+
+    Saving or deleting a cart item, e.g. in the admin, refreshes shopping
+    cart totals of its customer. Pair statements of the API refresh them
+    by themselves.
+    """
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -190,12 +500,347 @@ class IsInShoppingCart(models.Model):
         related_name="customers",
         verbose_name="Recipe in cart",
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Adding date",
+    )
+    servings = models.PositiveSmallIntegerField(
+        default=1,
+        validators=(
+            MinValueValidator(
+                1, message="Servings multiplier can not be less than 1."
+            ),
+        ),
+        verbose_name="Servings multiplier",
+    )
+
+    objects = ShoppingCartQuerySet.as_manager()
+
+    pair_fields = ("user", "recipe")
+    target_counter = "in_carts_count"
 
     class Meta:
         verbose_name = "Shopping cart"
         verbose_name_plural = "Shopping carts"
+        indexes = [
+            models.Index(fields=["created"], name="in_cart_created_idx"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["user", "recipe"], name="unique_in_cart_pair"
             ),
         ]
+
+    def save(self, *args, **kwargs):
+        """Save a cart item and refresh shopping cart totals of it.
+
+        A customer and a recipe of a changed cart item are refreshed too.
+        """
+        using = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self
+        )
+        totals = ShoppingCartIngredient.objects.using(using)
+        with transaction.atomic(using=using, savepoint=False):
+            pairs = {(self.user_id, self.recipe_id)}
+            if not self._state.adding:
+                pairs.update(
+                    type(self)._default_manager.using(using)
+                    .filter(pk=self.pk)
+                    .values_list("user", "recipe")
+                )
+            super().save(*args, **kwargs)
+            users, recipes = zip(*pairs)
+            totals.refresh(
+                list(set(users)), totals.get_ingredients(set(recipes))
+            )
+
+
+class ShoppingCartIngredientQuerySet(models.QuerySet):
+    """ShoppingCartIngredient custom queryset."""
+    def get_customers(self, recipes):
+        """Return ids of users having given recipes in shopping carts."""
+        return list(
+            IsInShoppingCart.objects.using(self.db)
+            .filter(recipe__in=recipes)
+            .order_by()
+            .values_list("user", flat=True)
+            .distinct()
+        )
+
+    def get_ingredients(self, recipes):
+        """Return ids of ingredients of given recipes."""
+        return list(
+            IngredientPortion.objects.using(self.db)
+            .filter(recipe__in=recipes)
+            .order_by()
+            .values_list("ingredient", flat=True)
+            .distinct()
+        )
+
+    def live_totals(self, users=None, ingredients=None):
+        """Aggregate cart totals from the live IngredientPortion join.
+
+        Amounts are multiplied by servings of every cart item. Customer
+        conditions are given in one filter call, so they share one join.
+        """
+        filters = {"recipe__customers__isnull": False}
+        if users is not None:
+            filters["recipe__customers__user__in"] = users
+        if ingredients is not None:
+            filters["ingredient__in"] = ingredients
+        return (
+            IngredientPortion.objects.filter(**filters)
+            .values("recipe__customers__user", "ingredient")
+            .annotate(
+                total=Sum(F("amount") * F("recipe__customers__servings"))
+            )
+            .order_by()
+        )
+
+    def refresh(self, users, ingredients):
+        """Recalculate totals of given users and ingredients only.
+
+        Live totals are upserted with one INSERT ... SELECT ... ON CONFLICT
+        DO UPDATE and totals which are gone are deleted, so concurrent
+        refreshes of one cart can not violate a unique pair. Callers
+        change carts in their own transaction, so no savepoint is made
+        inside it.
+        """
+        if not users or not ingredients:
+            return
+        self._for_write = True
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        user, ingredient, total_amount = (
+            quote_name(self.model._meta.get_field(field_name).column)
+            for field_name in ("user", "ingredient", "total_amount")
+        )
+        live_sql, params = (
+            self.live_totals(users, ingredients)
+            .query.get_compiler(using=self.db)
+            .as_sql()
+        )
+        with transaction.atomic(using=self.db, savepoint=False):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {quote_name(self.model._meta.db_table)} "
+                    f"({user}, {ingredient}, {total_amount}) "
+                    f"SELECT * FROM ({live_sql}) live_totals WHERE true "
+                    f"ON CONFLICT ({user}, {ingredient}) DO UPDATE "
+                    f"SET {total_amount} = EXCLUDED.{total_amount}",
+                    params,
+                )
+            self.filter(user__in=users, ingredient__in=ingredients).annotate(
+                is_live=Exists(
+                    IngredientPortion.objects.filter(
+                        ingredient=OuterRef("ingredient"),
+                        recipe__customers__user=OuterRef("user"),
+                    )
+                )
+            ).filter(is_live=False).delete()
+
+    def refresh_for_recipe(self, recipe, users=None, ingredients=None):
+        """Recalculate totals touched by a recipe in shopping carts."""
+        if users is None:
+            users = self.get_customers([recipe])
+        if ingredients is None:
+            ingredients = self.get_ingredients([recipe])
+        self.refresh(users, ingredients)
+
+    def rebuild(self, batch_size=None):
+        """Recalculate totals of every user from scratch.
+
+        A given batch size is clamped to a database limit of inserts.
+        """
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=row["recipe__customers__user"],
+                        ingredient_id=row["ingredient"],
+                        total_amount=row["total"],
+                    )
+                    for row in self.live_totals().iterator()
+                ),
+                batch_size=get_bulk_batch_size(
+                    self.model, batch_size, self.db
+                ),
+            )
+
+
+class ShoppingCartIngredient(models.Model):
+    """ShoppingCartIngredient model description.
+
+    Keeps summed ingredient amounts of every user shopping cart.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=True,
+        related_name="cart_ingredients",
+        verbose_name="Customer",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        db_index=True,
+        related_name="cart_totals",
+        verbose_name="Ingredient in cart",
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name="Total amount",
+    )
+
+    objects = ShoppingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Shopping cart ingredient"
+        verbose_name_plural = "Shopping cart ingredients"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_cart_ingredient_pair",
+            ),
+        ]
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+    """TimelineEntry custom queryset.
+
+    Entries are copied from follows and recipes with one INSERT ... SELECT
+    ... ON CONFLICT DO NOTHING, so no follower ids are read in Python.
+    Recipes posted while an author had more than FEED_FANOUT_MAX_FOLLOWERS
+    followers are not fanned out, they are merged into a feed on read
+    whatever number of followers the author has later.
+    """
+    def get_column(self, model, field_name):
+        """Return a quoted column of a model field."""
+        return connections[self.db].ops.quote_name(
+            model._meta.get_field(field_name).column
+        )
+
+    def add_followed_recipes(self, condition, params):
+        """Add entries of recipes of followed authors matching a condition.
+
+        A condition is SQL over follow f and recipe r tables.
+        """
+        self._for_write = True
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        columns = ", ".join(
+            self.get_column(self.model, field_name)
+            for field_name in ("user", "recipe", "author", "pub_date")
+        )
+        recipe_author = self.get_column(Recipe, "author")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote_name(self.model._meta.db_table)} "
+                f"({columns}) "
+                f"SELECT f.{self.get_column(Follow, 'follower')}, "
+                f"r.{self.get_column(Recipe, 'id')}, r.{recipe_author}, "
+                f"r.{self.get_column(Recipe, 'pub_date')} "
+                f"FROM {quote_name(Follow._meta.db_table)} f "
+                f"INNER JOIN {quote_name(Recipe._meta.db_table)} r "
+                f"ON r.{recipe_author} = "
+                f"f.{self.get_column(Follow, 'author')} "
+                f"WHERE {condition} ON CONFLICT DO NOTHING",
+                params,
+            )
+            return cursor.rowcount
+
+    def get_fan_out_condition(self):
+        """Return a condition of recipes which are fanned out."""
+        return f"r.{self.get_column(Recipe, 'fanned_out')} = %s", [True]
+
+    def fan_out(self, recipe):
+        """Add a new recipe to timelines of followers of its author."""
+        if not recipe.fanned_out:
+            return 0
+        return self.add_followed_recipes(
+            f"r.{self.get_column(Recipe, 'id')} = %s", [recipe.id]
+        )
+
+    def backfill(self, follower_id, authors_ids):
+        """Add fanned out recipes of followed authors to a follower timeline.
+
+        Other recipes of the authors are merged into a feed on read.
+        """
+        authors_ids = sorted(set(authors_ids))
+        if not authors_ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(authors_ids))
+        condition, params = self.get_fan_out_condition()
+        return self.add_followed_recipes(
+            f"{condition} AND f.{self.get_column(Follow, 'follower')} = %s "
+            f"AND f.{self.get_column(Follow, 'author')} IN ({placeholders})",
+            [*params, follower_id, *authors_ids],
+        )
+
+    def rebuild(self, followers_ids=None):
+        """Rebuild timelines of given followers or of every user."""
+        self._for_write = True
+        condition, params = self.get_fan_out_condition()
+        entries = self.all()
+        if followers_ids is not None:
+            followers_ids = sorted(set(followers_ids))
+            if not followers_ids:
+                return 0
+            entries = entries.filter(user__in=followers_ids)
+            placeholders = ", ".join(["%s"] * len(followers_ids))
+            condition += (
+                f" AND f.{self.get_column(Follow, 'follower')} "
+                f"IN ({placeholders})"
+            )
+            params.extend(followers_ids)
+        with transaction.atomic(using=self.db):
+            entries.delete()
+            return self.add_followed_recipes(condition, params)
+
+
+class TimelineEntry(models.Model):
+    """TimelineEntry model description.
+
+    Keeps recipes of followed authors of every user in a feed order.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name="timeline_entries",
+        verbose_name="Timeline owner",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        db_index=True,
+        related_name="timeline_entries",
+        verbose_name="Recipe in timeline",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=True,
+        related_name="fanned_out_entries",
+        verbose_name="Recipe author",
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Recipe publication date",
+    )
+
+    objects = TimelineEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Timeline entry"
+        verbose_name_plural = "Timeline entries"
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="timeline_user_feed_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_timeline_pair"
+            ),
+        ]
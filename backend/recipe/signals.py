@@ -0,0 +1,90 @@
+"""Recipe signals."""
+
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from recipe.models import (IsFavorited, IsInShoppingCart, Recipe,
+                           ShoppingCartIngredient, TimelineEntry)
+from users.models import User
+
+
+@receiver(post_save, sender=IsFavorited)
+@receiver(post_save, sender=IsInShoppingCart)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    """Increase a favorites or shopping carts counter of a recipe."""
+    if created:
+        counter = sender.target_counter
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            **{counter: F(counter) + 1}
+        )
+
+
+@receiver(pre_delete, sender=User)
+def decrease_recipe_counters(sender, instance, **kwargs):
+    """Decrease counters of recipes favorited or put in a cart by a user.
+
+    Favorites and carts of a deleted user are deleted by a cascade in one
+    query, so their recipes counters are changed in bulk here.
+    """
+    for model in (IsFavorited, IsInShoppingCart):
+        model.objects.filter(user=instance).decrease_target_counters()
+
+
+@receiver(pre_delete, sender=User)
+def collect_cart_totals_of_recipes(sender, instance, using, **kwargs):
+    """Collect shopping cart totals touched by recipes of a deleted user.
+
+    Recipes of a user are deleted by a cascade, totals of other customers
+    are refreshed after it.
+    """
+    totals = ShoppingCartIngredient.objects.using(using)
+    recipes = Recipe.objects.using(using).filter(author=instance).values("pk")
+    instance.cart_totals_of_recipes = (
+        [
+            user_id
+            for user_id in totals.get_customers(recipes)
+            if user_id != instance.pk
+        ],
+        totals.get_ingredients(recipes),
+    )
+
+
+@receiver(post_delete, sender=User)
+def refresh_cart_totals_of_recipes(sender, instance, using, **kwargs):
+    """Refresh shopping cart totals touched by recipes of a deleted user."""
+    users, ingredients = getattr(instance, "cart_totals_of_recipes", ((), ()))
+    ShoppingCartIngredient.objects.using(using).refresh(users, ingredients)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_counter(sender, instance, created, **kwargs):
+    """Increase a recipes counter of an author."""
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+
+@receiver(pre_save, sender=Recipe)
+def mark_fanned_out_recipe(sender, instance, raw, **kwargs):
+    """Mark if a new recipe is fanned out to timelines of followers.
+
+    Recipes of authors with too many followers are merged into a feed on
+    read, and the mark keeps them there if the author loses followers.
+    """
+    if instance._state.adding and not raw:
+        instance.fanned_out = not User.objects.filter(
+            pk=instance.author_id,
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+        ).exists()
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    """Add a new recipe to timelines of followers of an author."""
+    if created:
+        TimelineEntry.objects.fan_out(instance)
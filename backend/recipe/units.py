@@ -0,0 +1,39 @@
+"""Measurement units normalization."""
+
+
+from django.db.models import Case, CharField, F, IntegerField, Value, When
+
+UNIT_CONVERSIONS = {
+    "кг": ("г", 1000),
+    "л": ("мл", 1000),
+    "стакан": ("мл", 250),
+    "ст. л.": ("мл", 15),
+    "ч. л.": ("мл", 5),
+}
+
+
+def get_base_unit(field_name):
+    """Return a SQL expression of a base unit of a unit field.
+
+    Units missing in UNIT_CONVERSIONS are base ones themselves.
+    """
+    return Case(
+        *(
+            When(**{field_name: unit}, then=Value(base_unit))
+            for unit, (base_unit, _) in UNIT_CONVERSIONS.items()
+        ),
+        default=F(field_name),
+        output_field=CharField(),
+    )
+
+
+def get_unit_factor(field_name):
+    """Return a SQL expression of a factor converting a unit to a base one."""
+    return Case(
+        *(
+            When(**{field_name: unit}, then=Value(factor))
+            for unit, (_, factor) in UNIT_CONVERSIONS.items()
+        ),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
@@ -6,3 +6,7 @@ from django.apps import AppConfig
 
 class UserConfig(AppConfig):
     name = "users"
+
+    def ready(self):
+        """Connect user signals."""
+        import users.signals  # noqa: F401
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'follower'], name='follow_author_follower_idx'),
+        ),
+    ]
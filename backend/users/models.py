@@ -1,8 +1,16 @@
 """User models description."""
 
 
+from collections import defaultdict
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import UserManager as AuthUserManager
+from django.db import connections, models, transaction
+from django.db.models import Count, F
+from django.db.models.sql import InsertQuery
+from django.dispatch import Signal
+
+users_updated = Signal(providing_args=["users_ids", "using"])
 
 
 class UserRoles:
@@ -15,6 +23,165 @@ class UserRoles:
     ]
 
 
+class PairQuerySet(models.QuerySet):
+    """Queryset of unique (owner, target) pairs like follows or favorites.
+
+    Pairs are added with one INSERT ... ON CONFLICT DO NOTHING and removed
+    with one DELETE, both return affected targets, so no existence check
+    is needed and concurrent requests can not race. Statements skip model
+    signals, a counter of targets named by a target_counter attribute of
+    a model is changed here instead, on a queryset delete too. RETURNING
+    needs PostgreSQL or SQLite 3.35 and newer.
+    """
+    def get_pair_columns(self):
+        """Return quoted owner and target columns of a model."""
+        quote_name = connections[self.db].ops.quote_name
+        return [
+            quote_name(self.model._meta.get_field(field_name).column)
+            for field_name in self.model.pair_fields
+        ]
+
+    def update_target_counter(self, targets_ids, delta):
+        """Change a counter of given targets by a delta."""
+        if not targets_ids:
+            return
+        counter = self.model.target_counter
+        target_model = self.model._meta.get_field(
+            self.model.pair_fields[1]
+        ).related_model
+        targets = target_model.objects.filter(pk__in=targets_ids)
+        if delta < 0:
+            targets = targets.filter(**{f"{counter}__gte": -delta})
+        targets.update(**{counter: F(counter) + delta})
+
+    def decrease_target_counters(self):
+        """Decrease counters of targets by numbers of their pairs in bulk."""
+        targets_by_count = defaultdict(list)
+        for target_id, pairs_count in (
+            self.order_by()
+            .values_list(self.model.pair_fields[1])
+            .annotate(pairs_count=Count("pk"))
+        ):
+            targets_by_count[pairs_count].append(target_id)
+        for pairs_count, targets_ids in targets_by_count.items():
+            self.update_target_counter(targets_ids, -pairs_count)
+
+    def delete(self):
+        """Delete pairs and decrease counters of their targets in bulk."""
+        self._for_write = True
+        with transaction.atomic(using=self.db):
+            self.decrease_target_counters()
+            return super().delete()
+
+    def add_pairs(self, owner_id, targets_ids, values=None):
+        """Add missing pairs and return a map of added targets to pks.
+
+        Optional values are set to other fields of every added pair.
+        """
+        self._for_write = True
+        targets_ids = set(targets_ids)
+        if not targets_ids:
+            return {}
+        owner_field, target_field = self.model.pair_fields
+        query = InsertQuery(self.model, ignore_conflicts=True)
+        query.insert_values(
+            [
+                field
+                for field in self.model._meta.concrete_fields
+                if not field.primary_key
+            ],
+            [
+                self.model(
+                    **{
+                        f"{owner_field}_id": owner_id,
+                        f"{target_field}_id": target_id,
+                        **(values or {}),
+                    }
+                )
+                for target_id in sorted(targets_ids)
+            ],
+        )
+        (sql, params), = query.get_compiler(using=self.db).as_sql()
+        target_column = self.get_pair_columns()[1]
+        pk_column = connections[self.db].ops.quote_name(
+            self.model._meta.pk.column
+        )
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(
+                    f"{sql} RETURNING {target_column}, {pk_column}", params
+                )
+                added = dict(cursor.fetchall())
+            self.update_target_counter(list(added), 1)
+        return added
+
+    def remove_pairs(self, owner_id, targets_ids):
+        """Remove existing pairs and return a set of removed targets."""
+        self._for_write = True
+        targets_ids = set(targets_ids)
+        if not targets_ids:
+            return set()
+        connection = connections[self.db]
+        owner_column, target_column = self.get_pair_columns()
+        placeholders = ", ".join(["%s"] * len(targets_ids))
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {owner_column} = %s "
+                    f"AND {target_column} IN ({placeholders}) "
+                    f"RETURNING {target_column}",
+                    [owner_id, *sorted(targets_ids)],
+                )
+                removed = {row[0] for row in cursor.fetchall()}
+            self.update_target_counter(list(removed), -1)
+        return removed
+
+
+class PairMixin:
+    """Model mixin deleting a pair through PairQuerySet.
+
+    Pairs have no delete signals, so cascades delete them in one query
+    and counters of targets are changed by the queryset in bulk.
+    """
+    def delete(self, using=None, keep_parents=False):
+        """Redefinition delete method."""
+        return (
+            type(self)._default_manager.using(using)
+            .filter(pk=self.pk)
+            .delete()
+        )
+
+
+class UserQuerySet(models.QuerySet):
+    """Queryset of users announcing bulk updates.
+
+    An update skips model signals, so ids of updated users are sent by
+    a users_updated signal unless only counters or a last login change.
+    Historical models of migrations have no counter_fields and announce
+    nothing.
+    """
+    def update(self, **kwargs):
+        """Redefinition update method."""
+        counter_fields = getattr(self.model, "counter_fields", None)
+        if counter_fields is None or set(kwargs) <= {
+            *counter_fields,
+            "last_login",
+        }:
+            return super().update(**kwargs)
+        self._for_write = True
+        users_ids = list(self.values_list("pk", flat=True))
+        rows = super().update(**kwargs)
+        users_updated.send(
+            sender=self.model, users_ids=users_ids, using=self.db
+        )
+        return rows
+
+
+class UserManager(AuthUserManager.from_queryset(UserQuerySet)):
+    """Manager of users with UserQuerySet methods."""
+
+
 class User(AbstractUser):
     """User model description."""
     role = models.CharField(
@@ -40,6 +207,18 @@ class User(AbstractUser):
         max_length=150,
         verbose_name="User password",
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Recipes counter",
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Followers counter",
+    )
+
+    objects = UserManager()
+
+    counter_fields = ("recipes_count", "followers_count")
 
     class Meta:
         verbose_name = "User"
@@ -49,8 +228,23 @@ class User(AbstractUser):
         """Return string view for a username field."""
         return self.username
 
+    def save(self, *args, **kwargs):
+        """Save every field except counters of an existing object.
+
+        Counters are changed by F-expressions only, a stale value of an
+        object loaded earlier must not overwrite them.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
 
-class Follow(models.Model):
+
+class Follow(PairMixin, models.Model):
     """Follow model description."""
     follower = models.ForeignKey(
         User,
@@ -67,9 +261,20 @@ class Follow(models.Model):
         verbose_name="Following",
     )
 
+    objects = PairQuerySet.as_manager()
+
+    pair_fields = ("follower", "author")
+    target_counter = "followers_count"
+
     class Meta:
         verbose_name = "Follow"
         verbose_name_plural = "Follows"
+        indexes = [
+            models.Index(
+                fields=["author", "follower"],
+                name="follow_author_follower_idx",
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["follower", "author"], name="unique_follow_pair"
@@ -0,0 +1,27 @@
+"""User signals."""
+
+
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import Follow, User
+
+
+@receiver(post_save, sender=Follow)
+def increase_followers_counter(sender, instance, created, **kwargs):
+    """Increase a followers counter of an author."""
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F("followers_count") + 1
+        )
+
+
+@receiver(pre_delete, sender=User)
+def decrease_followers_counters(sender, instance, **kwargs):
+    """Decrease followers counters of authors followed by a deleted user.
+
+    Follows of a deleted user are deleted by a cascade in one query, so
+    counters of authors are changed in bulk here.
+    """
+    Follow.objects.filter(follower=instance).decrease_target_counters()